@@ -139,6 +139,9 @@ class _FallbackEncoder:
     def encode(self, text: str, **kwargs) -> list[int]:
         return list(text.encode("utf-8"))
 
+    def encode_ordinary(self, text: str) -> list[int]:
+        return self.encode(text)
+
 
 DEFAULT_SYSTEM_PROMPT_FILE = Path(__file__).parent / "system_prompt.txt"
 MAX_ARG_LOG = 1000
@@ -1874,7 +1877,9 @@ def estimate_tokens(messages: list, tools: list | None = None) -> int:
         reasoning_content = _msg_get(m, "reasoning_content")
         if reasoning_content:
             content += str(reasoning_content)
-        total += len(_encoder.encode(content))
+        # encode_ordinary skips the special-token scan; message text is never
+        # meant to contain control tokens, and encode() raises on them.
+        total += len(_encoder.encode_ordinary(content))
     total += _estimate_tool_tokens(tools)
     # Per-message overhead (role, separators) — ~4 tokens each
     total += 4 * len(messages)
@@ -1885,7 +1890,7 @@ def _estimate_tool_tokens(tools: list) -> int:
     """Estimate token cost of the tool schemas alone."""
     if not tools:
         return 0
-    return len(_encoder.encode(json.dumps(tools)))
+    return len(_encoder.encode_ordinary(json.dumps(tools)))
 
 
 def enforce_mcp_token_budget(
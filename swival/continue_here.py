@@ -125,7 +125,7 @@ def _build_deterministic_continue(
     # Snapshot history (investigation summaries)
     if snapshot_state is not None and snapshot_state.history:
         sections.append("\n## Prior investigation summaries")
-        for entry in snapshot_state.history[-5:]:
+        for entry in list(snapshot_state.history)[-5:]:
             label = entry.get("label", "investigation")
             summary = entry.get("summary", "")
             if summary:
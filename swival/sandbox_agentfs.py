@@ -32,6 +32,9 @@ _PATH_FLAGS = frozenset(
     }
 )
 
+# Matches "agentfs v0.6.2" or "agentfs 0.6.2-3-gabcdef-dirty"; group 1 is X.Y.Z.
+_VERSION_RE = re.compile(r"v?(\d+\.\d+\.\d+)")
+
 
 def is_sandboxed() -> bool:
     """Return True if running inside an AgentFS sandbox.
@@ -43,7 +46,8 @@ def is_sandboxed() -> bool:
     For external wrapping (``agentfs run -- swival ...``), only AGENTFS=1 is
     present.  That is also accepted — see ``is_inside_agentfs()``.
     """
-    return _has_swival_marker() and _has_agentfs_env()
+    env = os.environ
+    return env.get(_ENV_MARKER) == "1" and env.get(_AGENTFS_ENV) == "1"
 
 
 def is_inside_agentfs() -> bool:
@@ -53,19 +57,14 @@ def is_inside_agentfs() -> bool:
     - Swival re-exec'd itself (both markers set), or
     - The user wrapped Swival externally with ``agentfs run`` (only AGENTFS=1).
     """
-    return _has_agentfs_env()
-
-
-def _has_swival_marker() -> bool:
-    return os.environ.get(_ENV_MARKER) == "1"
-
-
-def _has_agentfs_env() -> bool:
     return os.environ.get(_AGENTFS_ENV) == "1"
 
 
 def _find_agentfs() -> str:
-    """Locate the agentfs binary. Raises ConfigError if not found."""
+    """Locate the agentfs binary and return its absolute path.
+
+    Raises ConfigError if not found.
+    """
     path = shutil.which("agentfs")
     if path is None:
         raise ConfigError(
@@ -73,7 +72,8 @@ def _find_agentfs() -> str:
             "Install AgentFS (https://github.com/tursodatabase/agentfs) "
             "or use --sandbox builtin."
         )
-    return path
+    # Absolute, so it can be exec'd directly after maybe_reexec() chdirs.
+    return os.path.abspath(path)
 
 
 def probe_agentfs(agentfs_bin: str) -> dict:
@@ -92,20 +92,25 @@ def probe_agentfs(agentfs_bin: str) -> dict:
             text=True,
             timeout=5,
         )
-        output = proc.stdout.strip()
-        # Parse patterns like "agentfs v0.6.2" or "agentfs 0.6.2-3-gabcdef-dirty"
-        m = re.search(r"v?(\d+\.\d+\.\d+)", output)
-        version = m.group(1) if m else "unknown"
     except (OSError, subprocess.TimeoutExpired):
-        version = "unknown"
+        return _probe_result("unknown")
+
+    return _probe_result(_parse_version(proc.stdout))
 
+
+def _probe_result(version: str) -> dict:
     supports_strict_read = False
     if _STRICT_READ_MIN_VERSION is not None and version != "unknown":
         supports_strict_read = _version_gte(version, _STRICT_READ_MIN_VERSION)
-
     return {"version": version, "supports_strict_read": supports_strict_read}
 
 
+def _parse_version(output: str) -> str:
+    """Extract ``X.Y.Z`` from ``agentfs --version`` output, or ``"unknown"``."""
+    m = _VERSION_RE.search(output)
+    return m.group(1) if m else "unknown"
+
+
 def _version_gte(version: str, minimum: str) -> bool:
     """Return True if *version* >= *minimum* using simple numeric comparison."""
 
@@ -152,6 +157,17 @@ def diff_hint(session: str | None) -> str | None:
     return None
 
 
+def _absolute_path(value: str) -> str:
+    """Return *value* as an absolute path, resolving only when necessary.
+
+    Already-absolute paths are returned as-is: they survive the chdir before
+    re-exec unchanged, so there is no need to pay for a realpath walk.
+    """
+    if os.path.isabs(value):
+        return value
+    return os.path.realpath(os.path.expanduser(value))
+
+
 def _absolutize_argv(argv: list[str]) -> list[str]:
     """Return a copy of argv with path-bearing flag values resolved to absolute paths.
 
@@ -160,29 +176,28 @@ def _absolutize_argv(argv: list[str]) -> list[str]:
     re-exec.
     """
     result = list(argv)
+    n = len(result)
     i = 0
-    while i < len(result):
+    while i < n:
         token = result[i]
 
         # Stop at argument terminator — everything after is positional.
         if token == "--":
             break
 
-        # --flag=value form
-        eq = token.find("=")
-        if eq != -1 and token[:eq] in _PATH_FLAGS:
-            flag = token[:eq]
-            value = token[eq + 1 :]
-            result[i] = flag + "=" + str(Path(value).expanduser().resolve())
-            i += 1
-            continue
-
-        # --flag value form
-        if token in _PATH_FLAGS and i + 1 < len(result):
-            result[i + 1] = str(Path(result[i + 1]).expanduser().resolve())
+        # --flag value form: a single set lookup settles the common case.
+        if token in _PATH_FLAGS:
+            if i + 1 < n:
+                result[i + 1] = _absolute_path(result[i + 1])
             i += 2
             continue
 
+        # --flag=value form; only long options can carry one.
+        if token.startswith("--"):
+            flag, eq, value = token.partition("=")
+            if eq and flag in _PATH_FLAGS:
+                result[i] = f"{flag}={_absolute_path(value)}"
+
         i += 1
     return result
 
@@ -240,7 +255,7 @@ def maybe_reexec(
     strict-read support and raises ``ConfigError`` if the installed
     version does not support it.
 
-    On success, this function does not return (os.execvpe replaces the process).
+    On success, this function does not return (os.execve replaces the process).
     On failure, raises ConfigError.
     """
     if sandbox != "agentfs":
@@ -283,9 +298,7 @@ def maybe_reexec(
     # bin/ to be reachable on entry. The invariant that protects user
     # tools is that every *user-facing* spawn inside the re-exec'd
     # swival goes through swival._env.child_env().
-    env = os.environ.copy()
-    env[_ENV_MARKER] = "1"
-    env[_VERSION_ENV] = probe["version"]
+    env = {**os.environ, _ENV_MARKER: "1", _VERSION_ENV: probe["version"]}
     if effective_session is not None:
         env[_SESSION_ENV] = effective_session
 
@@ -293,7 +306,8 @@ def maybe_reexec(
     # overlay workspace aligns with the directory Swival considers writable.
     os.chdir(resolved_base)
 
-    os.execvpe(argv[0], argv, env)
+    # agentfs_bin is already an absolute path; skip execvpe's PATH search.
+    os.execve(agentfs_bin, argv, env)
 
 
 def check_sandbox_available() -> None:
@@ -234,6 +234,9 @@ class Session:
 
         # Setup state (cached after first _setup())
         self._setup_done = False
+        # agentfs availability cannot change under a running process, so a
+        # passing check survives a _setup() retried after a later failure.
+        self._sandbox_checked = False
         self._model_id: str | None = None
         self._api_base: str | None = None
         self._resolved_key: str | None = None
@@ -325,10 +328,11 @@ class Session:
                     f"{label} {name!r}; remove it"
                 )
 
-        if self.sandbox == "agentfs":
+        if self.sandbox == "agentfs" and not self._sandbox_checked:
             from .sandbox_agentfs import check_sandbox_available
 
             check_sandbox_available()
+            self._sandbox_checked = True
 
         if self.sandbox == "nono":
             from .sandbox_nono import check_sandbox_available, verify_net_blocked
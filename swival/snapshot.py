@@ -1,5 +1,6 @@
 """Snapshot tool for proactive context collapse."""
 
+import collections
 import json
 
 from . import fmt
@@ -39,6 +40,11 @@ READ_ONLY_TOOLS = frozenset(
 )
 
 
+def _encode(result: dict | str) -> str:
+    """Serialize an action result; error strings pass through unchanged."""
+    return result if isinstance(result, str) else json.dumps(result)
+
+
 class SnapshotState:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -59,8 +65,9 @@ class SnapshotState:
         # Dirty tracking (resets at every scope boundary)
         self.dirty_tools: set[str] = set()
 
-        # Completed history (survives compaction via prompt injection)
-        self.history: list[dict] = []
+        # Completed history (survives compaction via prompt injection);
+        # the oldest entries fall off once MAX_HISTORY is reached
+        self.history: collections.deque[dict] = collections.deque(maxlen=MAX_HISTORY)
 
         # Metrics
         self.stats: dict = {
@@ -95,6 +102,21 @@ class SnapshotState:
         messages: list | None = None,
         tool_call_id: str | None = None,
     ) -> str:
+        return _encode(
+            self._process(args, messages=messages, tool_call_id=tool_call_id)
+        )
+
+    def _process(
+        self,
+        args: dict,
+        *,
+        messages: list | None = None,
+        tool_call_id: str | None = None,
+    ) -> dict | str:
+        """Like process(), but returns the result dict before serialization.
+
+        Errors are still returned as ``"error: ..."`` strings.
+        """
         action = args.get("action", "")
         if action not in VALID_ACTIONS:
             return f"error: invalid action {action!r}, expected one of: {', '.join(sorted(VALID_ACTIONS))}"
@@ -109,7 +131,7 @@ class SnapshotState:
                 return "error: restore requires access to the message list"
             return self._restore(summary, messages, force, tool_call_id)
         elif action == "cancel":
-            return self.cancel()
+            return self._cancel()
         elif action == "status":
             return self._status(messages)
 
@@ -130,15 +152,13 @@ class SnapshotState:
         self.stats["saves"] += 1
         return None
 
-    def _save_response(self, label: str) -> str:
-        """Verbose log + JSON response shared by both save paths."""
+    def _save_response(self, label: str) -> dict:
+        """Verbose log + response shared by both save paths."""
         if self.verbose:
             fmt.info(f"snapshot: checkpoint saved — {label}")
-        return json.dumps(
-            {"action": "save", "label": label, "status": "checkpoint_set"}
-        )
+        return {"action": "save", "label": label, "status": "checkpoint_set"}
 
-    def _save(self, label: str, tool_call_id: str | None) -> str:
+    def _save(self, label: str, tool_call_id: str | None) -> dict | str:
         err = self._save_common(label)
         if err:
             return err
@@ -147,6 +167,9 @@ class SnapshotState:
         return self._save_response(label)
 
     def save_at_index(self, label: str, index: int) -> str:
+        return _encode(self._save_at_index(label, index))
+
+    def _save_at_index(self, label: str, index: int) -> dict | str:
         err = self._save_common(label)
         if err:
             return err
@@ -163,7 +186,7 @@ class SnapshotState:
         tool_call_id: str | None,
         *,
         end_idx: int | None = None,
-    ) -> str:
+    ) -> dict | str:
         if not summary:
             return "error: restore requires a non-empty 'summary' parameter"
         if len(summary) > MAX_SUMMARY_LENGTH:
@@ -199,13 +222,11 @@ class SnapshotState:
                     break
 
         if end_idx - start_idx <= 0:
-            return json.dumps(
-                {
-                    "action": "restore",
-                    "status": "warning",
-                    "message": "empty scope — nothing to collapse",
-                }
-            )
+            return {
+                "action": "restore",
+                "status": "warning",
+                "message": "empty scope — nothing to collapse",
+            }
 
         # Calculate stats before collapsing
         turns_collapsed = end_idx - start_idx
@@ -256,8 +277,6 @@ class SnapshotState:
             "forced_restore": force and self.dirty,
         }
         self.history.append(entry)
-        if len(self.history) > MAX_HISTORY:
-            self.history = self.history[-MAX_HISTORY:]
 
         # Update state
         self.stats["restores"] += 1
@@ -276,25 +295,25 @@ class SnapshotState:
                 f"saved ~{tokens_saved} tokens"
             )
 
-        return json.dumps(
-            {
-                "action": "restore",
-                "status": "collapsed",
-                "turns_collapsed": turns_collapsed,
-                "tokens_saved": tokens_saved,
-            }
-        )
+        return {
+            "action": "restore",
+            "status": "collapsed",
+            "turns_collapsed": turns_collapsed,
+            "tokens_saved": tokens_saved,
+        }
 
     def _resolve_start(self, messages: list) -> int | str:
         """Find the start index of the scope to collapse.
 
         Returns the message index or an error string.
         """
-        # Explicit checkpoint: find the tool_call_id marker
+        # Explicit checkpoint: find the tool_call_id marker.  Scan from the
+        # end — the save is usually recent, so this stops after a few messages
+        # instead of walking the whole history.
         if self.explicit_active and self.explicit_begin_tool_call_id:
-            for i, msg in enumerate(messages):
-                tc_id = _msg_tool_call_id(msg)
-                if tc_id == self.explicit_begin_tool_call_id:
+            marker = self.explicit_begin_tool_call_id
+            for i in range(len(messages) - 1, -1, -1):
+                if _msg_tool_call_id(messages[i]) == marker:
                     # Start after the save response message
                     return i + 1
             return (
@@ -350,14 +369,15 @@ class SnapshotState:
         return boundary + 1
 
     def cancel(self) -> str:
+        return _encode(self._cancel())
+
+    def _cancel(self) -> dict:
         if not self.explicit_active:
-            return json.dumps(
-                {
-                    "action": "cancel",
-                    "status": "no_checkpoint",
-                    "message": "no explicit checkpoint to cancel",
-                }
-            )
+            return {
+                "action": "cancel",
+                "status": "no_checkpoint",
+                "message": "no explicit checkpoint to cancel",
+            }
 
         label = self.explicit_label
         self._clear_explicit()
@@ -366,9 +386,9 @@ class SnapshotState:
         if self.verbose:
             fmt.info(f"snapshot: cancelled checkpoint — {label}")
 
-        return json.dumps({"action": "cancel", "status": "cleared", "label": label})
+        return {"action": "cancel", "status": "cleared", "label": label}
 
-    def _status(self, messages: list | None) -> str:
+    def _status(self, messages: list | None) -> dict:
         info: dict = {
             "action": "status",
             "explicit_active": self.explicit_active,
@@ -378,7 +398,7 @@ class SnapshotState:
             "history_count": len(self.history),
             "stats": dict(self.stats),
         }
-        return json.dumps(info)
+        return info
 
     def invalidate_index_checkpoint(self) -> None:
         """Increment generation to invalidate any index-based checkpoint."""
@@ -386,6 +406,9 @@ class SnapshotState:
 
     def restore_with_autosummary(self, messages: list, summarize_fn) -> str:
         """Restore with auto-generated summary (for REPL /restore command)."""
+        return _encode(self._restore_with_autosummary(messages, summarize_fn))
+
+    def _restore_with_autosummary(self, messages: list, summarize_fn) -> dict | str:
         start_idx = self._resolve_start(messages)
         if isinstance(start_idx, str):
             return start_idx
@@ -7,12 +7,12 @@ _encoder = tiktoken.get_encoding("cl100k_base")
 
 def count_tokens(text: str) -> int:
     """Count the number of tokens in *text*."""
-    return len(_encoder.encode(text))
+    return len(_encoder.encode_ordinary(text))
 
 
 def truncate_to_tokens(text: str, max_tokens: int) -> str:
     """Return *text* truncated to at most *max_tokens* tokens."""
-    tokens = _encoder.encode(text)
+    tokens = _encoder.encode_ordinary(text)
     if len(tokens) <= max_tokens:
         return text
     return _encoder.decode(tokens[:max_tokens])
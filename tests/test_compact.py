@@ -50,6 +50,8 @@ from swival.agent import (
     _CONTEXT_EXHAUSTED_FALLBACK,
     _CONTEXT_EXHAUSTED_REASON,
     REACTIVE_BUDGET_BACKOFF,
+    _encoder,
+    _FallbackEncoder,
 )
 from swival.report import AgentError
 
@@ -154,6 +156,15 @@ class TestEstimateTokens:
         count_with_tc = estimate_tokens(msgs_with_tc)
         assert count_with_tc > count_no_tc
 
+    @pytest.mark.skipif(
+        isinstance(_encoder, _FallbackEncoder),
+        reason="tiktoken encoding unavailable; fallback has no special tokens",
+    )
+    def test_special_token_text_counted(self):
+        """Text that looks like a control token is counted, not rejected."""
+        msgs = [_user("tokenizer sentinel: <|endoftext|>")]
+        assert estimate_tokens(msgs) > 4
+
 
 # ---------------------------------------------------------------------------
 # group_into_turns
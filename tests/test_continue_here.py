@@ -178,16 +178,26 @@ class TestBuildDeterministic:
     def test_with_snapshot_state(self):
         msgs = [_sys(), _user("task")]
         snap = SnapshotState()
-        snap.history = [
+        snap.history.append(
             {
                 "label": "auth-review",
                 "summary": "Reviewed auth module, found JWT issue",
-            },
-        ]
+            }
+        )
         content = _build_deterministic_continue(msgs, snapshot_state=snap)
         assert "auth-review" in content
         assert "JWT issue" in content
 
+    def test_snapshot_state_keeps_last_five(self):
+        msgs = [_sys(), _user("task")]
+        snap = SnapshotState()
+        for i in range(7):
+            snap.history.append({"label": f"step-{i}", "summary": f"summary {i}"})
+        content = _build_deterministic_continue(msgs, snapshot_state=snap)
+        assert "step-1" not in content
+        assert "step-2" in content
+        assert "step-6" in content
+
     def test_with_thinking_state(self):
         msgs = [_sys(), _user("task")]
         think = ThinkingState()
@@ -4,10 +4,11 @@ import argparse
 import os
 import stat
 import sys
+import types
 
 import pytest
 
-from swival import agent
+from swival import agent, sandbox_agentfs
 from swival.config import _UNSET, ConfigError, apply_config_to_args
 from swival.report import ReportCollector
 from swival.sandbox_agentfs import (
@@ -17,6 +18,7 @@ from swival.sandbox_agentfs import (
     _VERSION_ENV,
     _absolutize_argv,
     _find_agentfs,
+    _parse_version,
     auto_session_id,
     build_agentfs_argv,
     check_sandbox_available,
@@ -35,59 +37,125 @@ from swival.sandbox_agentfs import (
 # ---------------------------------------------------------------------------
 
 
+# Namespace defaults mimicking build_parser(), shared by every _make_args() call.
+_ARGS_DEFAULTS = {
+    "provider": _UNSET,
+    "model": _UNSET,
+    "api_key": _UNSET,
+    "base_url": _UNSET,
+    "max_output_tokens": _UNSET,
+    "max_context_tokens": _UNSET,
+    "temperature": _UNSET,
+    "top_p": _UNSET,
+    "seed": _UNSET,
+    "max_turns": _UNSET,
+    "system_prompt": _UNSET,
+    "no_system_prompt": _UNSET,
+    "commands": _UNSET,
+    "yolo": _UNSET,
+    "files": _UNSET,
+    "add_dir": None,
+    "add_dir_ro": None,
+    "sandbox": _UNSET,
+    "sandbox_session": _UNSET,
+    "sandbox_strict_read": _UNSET,
+    "no_sandbox_auto_session": _UNSET,
+    "no_read_guard": _UNSET,
+    "no_instructions": _UNSET,
+    "no_skills": _UNSET,
+    "skills_dir": None,
+    "no_history": _UNSET,
+    "color": _UNSET,
+    "no_color": _UNSET,
+    "quiet": _UNSET,
+    "reviewer": _UNSET,
+    "review_prompt": _UNSET,
+    "objective": _UNSET,
+    "verify": _UNSET,
+    "max_review_rounds": _UNSET,
+}
+
+
+@pytest.fixture
+def resolved_tmp(tmp_path):
+    """tmp_path with symlinks resolved, computed once per test."""
+    return tmp_path.resolve()
+
+
+# Report fields that every sandbox report test passes unchanged.
+_BASE_REPORT_KWARGS = {
+    "task": "test",
+    "model": "m",
+    "provider": "lmstudio",
+    "settings": {},
+    "outcome": "success",
+    "answer": "ok",
+    "exit_code": 0,
+    "turns": 1,
+}
+
+
 def _make_args(**overrides):
     """Build a namespace mimicking build_parser() defaults."""
-    defaults = {
-        "provider": _UNSET,
-        "model": _UNSET,
-        "api_key": _UNSET,
-        "base_url": _UNSET,
-        "max_output_tokens": _UNSET,
-        "max_context_tokens": _UNSET,
-        "temperature": _UNSET,
-        "top_p": _UNSET,
-        "seed": _UNSET,
-        "max_turns": _UNSET,
-        "system_prompt": _UNSET,
-        "no_system_prompt": _UNSET,
-        "commands": _UNSET,
-        "yolo": _UNSET,
-        "files": _UNSET,
-        "add_dir": None,
-        "add_dir_ro": None,
-        "sandbox": _UNSET,
-        "sandbox_session": _UNSET,
-        "sandbox_strict_read": _UNSET,
-        "no_sandbox_auto_session": _UNSET,
-        "no_read_guard": _UNSET,
-        "no_instructions": _UNSET,
-        "no_skills": _UNSET,
-        "skills_dir": None,
-        "no_history": _UNSET,
-        "color": _UNSET,
-        "no_color": _UNSET,
-        "quiet": _UNSET,
-        "reviewer": _UNSET,
-        "review_prompt": _UNSET,
-        "objective": _UNSET,
-        "verify": _UNSET,
-        "max_review_rounds": _UNSET,
-    }
-    defaults.update(overrides)
-    return argparse.Namespace(**defaults)
+    return argparse.Namespace(**{**_ARGS_DEFAULTS, **overrides})
+
+
+# Mock agentfs: prints the configured version for --version, else echoes args.
+_MOCK_SCRIPT_PREFIX = b'#!/bin/sh\nif [ "$1" = "--version" ]; then echo "'
+_MOCK_SCRIPT_SUFFIX = b'"; exit 0; fi\necho $@\n'
 
 
 def _mock_agentfs_script(tmp_path, *, version_output="agentfs v0.6.2"):
     """Write a dummy agentfs script that prints its args or version."""
     script = tmp_path / "agentfs"
-    script.write_text(
-        f'#!/bin/sh\nif [ "$1" = "--version" ]; then echo "{version_output}"; exit 0; fi\necho $@\n',
-        encoding="utf-8",
-    )
-    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    data = _MOCK_SCRIPT_PREFIX + version_output.encode("ascii") + _MOCK_SCRIPT_SUFFIX
+    fd = os.open(script, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        # fchmod: the mode passed to open() is subject to umask and ignored
+        # when the script already exists.
+        os.fchmod(fd, 0o755)
+        os.write(fd, data)
+    finally:
+        os.close(fd)
     return str(script)
 
 
+def _arg_positions(argv):
+    """Map each token in *argv* to the list of indices where it appears."""
+    positions = {}
+    for i, tok in enumerate(argv):
+        positions.setdefault(tok, []).append(i)
+    return positions
+
+
+@pytest.fixture(scope="module")
+def cli_parser():
+    """The real CLI parser, built once; parse_args() does not mutate it."""
+    return agent.build_parser()
+
+
+@pytest.fixture(scope="session")
+def mock_agentfs_dir(tmp_path_factory):
+    """Directory holding a default mock agentfs, written once per session."""
+    d = tmp_path_factory.mktemp("agentfs_bin")
+    _mock_agentfs_script(d)
+    return d
+
+
+@pytest.fixture
+def fake_probe(monkeypatch):
+    """Return a setter that stubs probe_agentfs() to report a fixed version."""
+
+    def _set(version):
+        monkeypatch.setattr(
+            sandbox_agentfs,
+            "probe_agentfs",
+            lambda agentfs_bin: {"version": version, "supports_strict_read": False},
+        )
+
+    return _set
+
+
 def _set_sandboxed(monkeypatch):
     """Set both env markers to simulate Swival-initiated re-exec inside agentfs."""
     monkeypatch.setenv(_ENV_MARKER, "1")
@@ -100,6 +168,12 @@ def _set_external_agentfs(monkeypatch):
     monkeypatch.setenv(_AGENTFS_ENV, "1")
 
 
+def _set_swival_marker_only(monkeypatch):
+    """Set only SWIVAL_AGENTFS_ACTIVE=1, as a user trying to bypass the sandbox would."""
+    monkeypatch.setenv(_ENV_MARKER, "1")
+    monkeypatch.delenv(_AGENTFS_ENV, raising=False)
+
+
 def _clear_sandboxed(monkeypatch):
     """Clear both env markers."""
     monkeypatch.delenv(_ENV_MARKER, raising=False)
@@ -122,8 +196,7 @@ class TestIsSandboxed:
 
     def test_not_sandboxed_with_only_swival_marker(self, monkeypatch):
         """Setting SWIVAL_AGENTFS_ACTIVE alone must not bypass the check."""
-        monkeypatch.setenv(_ENV_MARKER, "1")
-        monkeypatch.delenv(_AGENTFS_ENV, raising=False)
+        _set_swival_marker_only(monkeypatch)
         assert is_sandboxed() is False
 
     def test_not_sandboxed_with_only_agentfs_marker(self, monkeypatch):
@@ -161,8 +234,7 @@ class TestIsInsideAgentfs:
         assert is_inside_agentfs() is True
 
     def test_false_with_only_swival_marker(self, monkeypatch):
-        monkeypatch.setenv(_ENV_MARKER, "1")
-        monkeypatch.delenv(_AGENTFS_ENV, raising=False)
+        _set_swival_marker_only(monkeypatch)
         assert is_inside_agentfs() is False
 
 
@@ -172,10 +244,14 @@ class TestIsInsideAgentfs:
 
 
 class TestFindAgentfs:
-    def test_found_on_path(self, tmp_path, monkeypatch):
-        script = _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
-        assert _find_agentfs() == script
+    def test_found_on_path(self, mock_agentfs_dir, monkeypatch):
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
+        assert _find_agentfs() == str(mock_agentfs_dir / "agentfs")
+
+    def test_relative_path_entry_made_absolute(self, mock_agentfs_dir, monkeypatch):
+        monkeypatch.chdir(mock_agentfs_dir.parent)
+        monkeypatch.setenv("PATH", mock_agentfs_dir.name)
+        assert _find_agentfs() == str(mock_agentfs_dir / "agentfs")
 
     def test_not_found_raises(self, monkeypatch):
         monkeypatch.setenv("PATH", "/nonexistent-dir-for-test")
@@ -194,24 +270,24 @@ class TestFindAgentfs:
 
 
 class TestAbsolutizeArgv:
-    def test_resolves_base_dir(self, tmp_path, monkeypatch):
+    def test_resolves_base_dir(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(["swival", "--base-dir", "subdir", "question"])
-        assert result[2] == str((tmp_path / "subdir").resolve())
+        assert result[2] == str(resolved_tmp / "subdir")
 
-    def test_resolves_add_dir(self, tmp_path, monkeypatch):
+    def test_resolves_add_dir(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(["swival", "--add-dir", "rel/path", "question"])
-        assert result[2] == str((tmp_path / "rel/path").resolve())
+        assert result[2] == str(resolved_tmp / "rel/path")
 
-    def test_resolves_multiple_path_flags(self, tmp_path, monkeypatch):
+    def test_resolves_multiple_path_flags(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(
             ["swival", "--base-dir", "proj", "--add-dir", "extra", "--add-dir-ro", "ro"]
         )
-        assert result[2] == str((tmp_path / "proj").resolve())
-        assert result[4] == str((tmp_path / "extra").resolve())
-        assert result[6] == str((tmp_path / "ro").resolve())
+        assert result[2] == str(resolved_tmp / "proj")
+        assert result[4] == str(resolved_tmp / "extra")
+        assert result[6] == str(resolved_tmp / "ro")
 
     def test_preserves_absolute_paths(self):
         result = _absolutize_argv(["swival", "--base-dir", "/absolute/path", "q"])
@@ -236,51 +312,55 @@ class TestAbsolutizeArgv:
 
         assert result[2] == str(Path("~/myproj").expanduser().resolve())
 
-    def test_equals_form_resolved(self, tmp_path, monkeypatch):
+    def test_equals_form_resolved(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(["swival", "--base-dir=subdir", "question"])
-        assert result[1] == "--base-dir=" + str((tmp_path / "subdir").resolve())
+        assert result[1] == "--base-dir=" + str(resolved_tmp / "subdir")
 
-    def test_equals_form_multiple_flags(self, tmp_path, monkeypatch):
+    def test_equals_form_multiple_flags(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(
             ["swival", "--base-dir=proj", "--add-dir=extra", "--add-dir-ro=ro"]
         )
         assert result[0] == "swival"
-        assert result[1] == "--base-dir=" + str((tmp_path / "proj").resolve())
-        assert result[2] == "--add-dir=" + str((tmp_path / "extra").resolve())
-        assert result[3] == "--add-dir-ro=" + str((tmp_path / "ro").resolve())
+        assert result[1] == "--base-dir=" + str(resolved_tmp / "proj")
+        assert result[2] == "--add-dir=" + str(resolved_tmp / "extra")
+        assert result[3] == "--add-dir-ro=" + str(resolved_tmp / "ro")
 
     def test_equals_form_absolute_preserved(self):
         result = _absolutize_argv(["swival", "--base-dir=/abs/path", "q"])
         assert result[1] == "--base-dir=/abs/path"
 
-    def test_equals_form_mixed_with_split_form(self, tmp_path, monkeypatch):
+    def test_equals_form_mixed_with_split_form(
+        self, tmp_path, resolved_tmp, monkeypatch
+    ):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(
             ["swival", "--base-dir=proj", "--add-dir", "extra", "question"]
         )
-        assert result[1] == "--base-dir=" + str((tmp_path / "proj").resolve())
-        assert result[3] == str((tmp_path / "extra").resolve())
+        assert result[1] == "--base-dir=" + str(resolved_tmp / "proj")
+        assert result[3] == str(resolved_tmp / "extra")
 
     def test_equals_form_non_path_flag_unchanged(self):
         result = _absolutize_argv(["swival", "--model=gpt-4", "question"])
         assert result[1] == "--model=gpt-4"
 
-    def test_stops_at_double_dash_equals_form(self, tmp_path, monkeypatch):
+    def test_stops_at_double_dash_equals_form(
+        self, tmp_path, resolved_tmp, monkeypatch
+    ):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(
             ["swival", "--base-dir", "proj", "--", "--base-dir=subdir"]
         )
-        assert result[2] == str((tmp_path / "proj").resolve())
+        assert result[2] == str(resolved_tmp / "proj")
         assert result[4] == "--base-dir=subdir"  # untouched
 
-    def test_stops_at_double_dash_split_form(self, tmp_path, monkeypatch):
+    def test_stops_at_double_dash_split_form(self, tmp_path, resolved_tmp, monkeypatch):
         monkeypatch.chdir(tmp_path)
         result = _absolutize_argv(
             ["swival", "--add-dir", "proj", "--", "--add-dir", "rel"]
         )
-        assert result[2] == str((tmp_path / "proj").resolve())
+        assert result[2] == str(resolved_tmp / "proj")
         assert result[4] == "--add-dir"  # untouched
         assert result[5] == "rel"  # untouched
 
@@ -291,7 +371,7 @@ class TestAbsolutizeArgv:
 
 
 class TestBuildArgv:
-    def test_basic_argv(self, tmp_path):
+    def test_basic_argv(self, tmp_path, resolved_tmp):
         argv = build_agentfs_argv(
             agentfs_bin="/usr/local/bin/agentfs",
             base_dir=str(tmp_path),
@@ -303,7 +383,7 @@ class TestBuildArgv:
         assert argv[1] == "run"
         assert "--no-default-allows" in argv
         assert "--allow" in argv
-        resolved_base = str(tmp_path.resolve())
+        resolved_base = str(resolved_tmp)
         allow_idx = argv.index("--allow")
         assert argv[allow_idx + 1] == resolved_base
         assert "--" in argv
@@ -331,7 +411,7 @@ class TestBuildArgv:
         )
         assert "--session" not in argv
 
-    def test_add_dirs_become_allow(self, tmp_path):
+    def test_add_dirs_become_allow(self, tmp_path, resolved_tmp):
         extra1 = tmp_path / "extra1"
         extra2 = tmp_path / "extra2"
         extra1.mkdir()
@@ -343,12 +423,12 @@ class TestBuildArgv:
             session=None,
             swival_argv=["swival", "q"],
         )
-        allow_indices = [i for i, v in enumerate(argv) if v == "--allow"]
+        allow_indices = _arg_positions(argv)["--allow"]
         assert len(allow_indices) == 3  # base_dir + 2 extras
         allow_paths = [argv[i + 1] for i in allow_indices]
-        assert str(tmp_path.resolve()) in allow_paths
-        assert str(extra1.resolve()) in allow_paths
-        assert str(extra2.resolve()) in allow_paths
+        assert str(resolved_tmp) in allow_paths
+        assert str(resolved_tmp / "extra1") in allow_paths
+        assert str(resolved_tmp / "extra2") in allow_paths
 
     def test_no_default_allows_always_present(self, tmp_path):
         argv = build_agentfs_argv(
@@ -408,20 +488,19 @@ class TestMaybeReexec:
                 add_dirs=[],
             )
 
-    def test_calls_execvpe(self, tmp_path, monkeypatch):
+    def test_calls_execve(self, tmp_path, mock_agentfs_dir, monkeypatch):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "--repl"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["file"] = file
             captured["args"] = args
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -431,20 +510,21 @@ class TestMaybeReexec:
             add_dirs=[],
         )
 
+        args = captured["args"]
+        positions = _arg_positions(args)
         assert captured["file"].endswith("agentfs")
-        assert captured["args"][1] == "run"
-        assert "--no-default-allows" in captured["args"]
-        assert "--session" in captured["args"]
-        session_idx = captured["args"].index("--session")
-        assert captured["args"][session_idx + 1] == "test-session"
+        assert args[1] == "run"
+        assert "--no-default-allows" in positions
+        assert "--session" in positions
+        assert args[positions["--session"][0] + 1] == "test-session"
         assert captured["env"][_ENV_MARKER] == "1"
-        dash_idx = captured["args"].index("--")
-        assert captured["args"][dash_idx + 1 :] == ["swival", "--repl"]
+        assert args[positions["--"][0] + 1 :] == ["swival", "--repl"]
 
-    def test_passes_add_dirs_as_allow(self, tmp_path, monkeypatch):
+    def test_passes_add_dirs_as_allow(
+        self, tmp_path, resolved_tmp, mock_agentfs_dir, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         extra = tmp_path / "extra"
@@ -452,10 +532,10 @@ class TestMaybeReexec:
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["args"] = args
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -465,21 +545,23 @@ class TestMaybeReexec:
             add_dirs=[str(extra)],
         )
 
-        allow_indices = [i for i, v in enumerate(captured["args"]) if v == "--allow"]
+        args = captured["args"]
+        allow_indices = _arg_positions(args)["--allow"]
         assert len(allow_indices) == 2  # base_dir + extra
-        allow_paths = [captured["args"][i + 1] for i in allow_indices]
-        assert str(extra.resolve()) in allow_paths
+        allow_paths = [args[i + 1] for i in allow_indices]
+        assert str(resolved_tmp / "extra") in allow_paths
 
-    def test_chdir_to_base_dir_before_exec(self, tmp_path, monkeypatch):
+    def test_chdir_to_base_dir_before_exec(
+        self, tmp_path, resolved_tmp, mock_agentfs_dir, monkeypatch
+    ):
         """Verify CWD is changed to base_dir so agentfs overlays the right directory."""
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         chdir_calls = []
         monkeypatch.setattr(os, "chdir", lambda p: chdir_calls.append(p))
-        monkeypatch.setattr(os, "execvpe", lambda f, a, e: None)
+        monkeypatch.setattr(os, "execve", lambda f, a, e: None)
 
         maybe_reexec(
             sandbox="agentfs",
@@ -489,12 +571,11 @@ class TestMaybeReexec:
         )
 
         assert len(chdir_calls) == 1
-        assert chdir_calls[0] == str(tmp_path.resolve())
+        assert chdir_calls[0] == str(resolved_tmp)
 
     def test_swival_marker_alone_does_not_skip_reexec(self, tmp_path, monkeypatch):
         """Setting only SWIVAL_AGENTFS_ACTIVE=1 (without AGENTFS=1) must not skip re-exec."""
-        monkeypatch.setenv(_ENV_MARKER, "1")
-        monkeypatch.delenv(_AGENTFS_ENV, raising=False)
+        _set_swival_marker_only(monkeypatch)
         monkeypatch.setenv("PATH", "/nonexistent-dir-for-test")
 
         with pytest.raises(ConfigError, match="agentfs binary not found"):
@@ -505,11 +586,12 @@ class TestMaybeReexec:
                 add_dirs=[],
             )
 
-    def test_relative_paths_absolutized_before_reexec(self, tmp_path, monkeypatch):
+    def test_relative_paths_absolutized_before_reexec(
+        self, tmp_path, resolved_tmp, mock_agentfs_dir, monkeypatch
+    ):
         """Relative --base-dir in argv must be resolved before chdir + re-exec."""
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
 
         subdir = tmp_path / "project"
         subdir.mkdir()
@@ -522,10 +604,10 @@ class TestMaybeReexec:
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["args"] = args
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -539,9 +621,9 @@ class TestMaybeReexec:
         dash_idx = captured["args"].index("--")
         child_argv = captured["args"][dash_idx + 1 :]
         bd_idx = child_argv.index("--base-dir")
-        assert child_argv[bd_idx + 1] == str(subdir.resolve())
+        assert child_argv[bd_idx + 1] == str(resolved_tmp / "project")
         ad_idx = child_argv.index("--add-dir")
-        assert child_argv[ad_idx + 1] == str(subdir.resolve())
+        assert child_argv[ad_idx + 1] == str(resolved_tmp / "project")
 
 
 # ===========================================================================
@@ -565,8 +647,7 @@ class TestCheckSandboxAvailable:
         check_sandbox_available()  # should not raise
 
     def test_raises_with_only_swival_marker(self, monkeypatch):
-        monkeypatch.setenv(_ENV_MARKER, "1")
-        monkeypatch.delenv(_AGENTFS_ENV, raising=False)
+        _set_swival_marker_only(monkeypatch)
         with pytest.raises(ConfigError, match="requires running inside an AgentFS"):
             check_sandbox_available()
 
@@ -600,6 +681,24 @@ class TestSessionSandboxFailFast:
             sess._setup()
         assert "requires running inside" not in str(exc_info.value)
 
+    def test_session_agentfs_check_runs_once(self, tmp_path, monkeypatch):
+        """A _setup() retried after a later failure does not re-check the sandbox."""
+        from swival.session import Session
+
+        calls = []
+        monkeypatch.setattr(
+            sandbox_agentfs, "check_sandbox_available", lambda: calls.append(1)
+        )
+        monkeypatch.setattr(
+            "swival.agent.resolve_provider",
+            lambda **kw: (_ for _ in ()).throw(RuntimeError("no provider")),
+        )
+        sess = Session(base_dir=str(tmp_path), sandbox="agentfs", history=False)
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="no provider"):
+                sess._setup()
+        assert calls == [1]
+
     def test_session_builtin_does_not_check(self, tmp_path, monkeypatch):
         """sandbox='builtin' should not trigger the agentfs check."""
         from swival.session import Session
@@ -659,69 +758,25 @@ class TestConfigParsing:
 
 
 class TestReportSandboxMetadata:
-    def test_report_includes_sandbox_builtin_by_default(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-        )
-        assert r["sandbox"] == {"mode": "builtin"}
-
-    def test_report_includes_sandbox_agentfs_with_session(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-            sandbox_session="abc123",
-        )
-        assert r["sandbox"] == {
-            "mode": "agentfs",
-            "session": "abc123",
-            "strict_read": False,
-        }
-
-    def test_report_sandbox_no_session_key_when_none(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-        )
-        assert r["sandbox"] == {"mode": "agentfs", "strict_read": False}
-        assert "session" not in r["sandbox"]
-
-    def test_finalize_passes_sandbox_through(self, tmp_path):
-        rc = ReportCollector()
-        r = rc.finalize(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-            sandbox_session="s1",
+    @pytest.mark.parametrize(
+        "extras,expected",
+        [
+            ({}, {"mode": "builtin"}),
+            (
+                {"sandbox_mode": "agentfs", "sandbox_session": "abc123"},
+                {"mode": "agentfs", "session": "abc123", "strict_read": False},
+            ),
+            ({"sandbox_mode": "agentfs"}, {"mode": "agentfs", "strict_read": False}),
+        ],
+        ids=["builtin-default", "agentfs-with-session", "agentfs-no-session"],
+    )
+    def test_report_sandbox_block(self, extras, expected):
+        r = ReportCollector().build_report(**_BASE_REPORT_KWARGS, **extras)
+        assert r["sandbox"] == expected
+
+    def test_finalize_passes_sandbox_through(self):
+        r = ReportCollector().finalize(
+            **_BASE_REPORT_KWARGS, sandbox_mode="agentfs", sandbox_session="s1"
         )
         assert r["sandbox"]["mode"] == "agentfs"
         assert r["sandbox"]["session"] == "s1"
@@ -733,31 +788,26 @@ class TestReportSandboxMetadata:
 
 
 class TestCLIIntegration:
-    def test_sandbox_flag_parsed(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(["--sandbox", "agentfs", "question"])
+    def test_sandbox_flag_parsed(self, cli_parser):
+        args = cli_parser.parse_args(["--sandbox", "agentfs", "question"])
         assert args.sandbox == "agentfs"
 
-    def test_sandbox_default_unset(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(["question"])
+    def test_sandbox_default_unset(self, cli_parser):
+        args = cli_parser.parse_args(["question"])
         assert args.sandbox is _UNSET
 
-    def test_sandbox_session_parsed(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(
+    def test_sandbox_session_parsed(self, cli_parser):
+        args = cli_parser.parse_args(
             ["--sandbox", "agentfs", "--sandbox-session", "my-id", "question"]
         )
         assert args.sandbox_session == "my-id"
 
-    def test_sandbox_invalid_choice_rejected(self):
-        parser = agent.build_parser()
+    def test_sandbox_invalid_choice_rejected(self, cli_parser):
         with pytest.raises(SystemExit):
-            parser.parse_args(["--sandbox", "docker", "question"])
+            cli_parser.parse_args(["--sandbox", "docker", "question"])
 
-    def test_sandbox_builtin_explicit(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(["--sandbox", "builtin", "question"])
+    def test_sandbox_builtin_explicit(self, cli_parser):
+        args = cli_parser.parse_args(["--sandbox", "builtin", "question"])
         assert args.sandbox == "builtin"
 
 
@@ -784,12 +834,12 @@ class TestMockAgentfsBinary:
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["file"] = file
             captured["args"] = args
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -802,14 +852,14 @@ class TestMockAgentfsBinary:
         assert _ENV_MARKER in captured["env"]
         assert captured["env"][_ENV_MARKER] == "1"
         args = captured["args"]
+        positions = _arg_positions(args)
         assert args[0].endswith("agentfs")
         assert args[1] == "run"
-        assert "--no-default-allows" in args
-        assert "--session" in args
-        idx = args.index("--session")
-        assert args[idx + 1] == "test-session"
-        assert "--" in args
-        dash = args.index("--")
+        assert "--no-default-allows" in positions
+        assert "--session" in positions
+        assert args[positions["--session"][0] + 1] == "test-session"
+        assert "--" in positions
+        dash = positions["--"][0]
         assert args[dash + 1 :] == ["swival", "--sandbox", "agentfs", "task"]
 
     def test_builtin_mode_run_command_unchanged(self, tmp_path, monkeypatch):
@@ -819,7 +869,7 @@ class TestMockAgentfsBinary:
         def should_not_be_called(file, args, env):
             call_count["n"] += 1
 
-        monkeypatch.setattr(os, "execvpe", should_not_be_called)
+        monkeypatch.setattr(os, "execve", should_not_be_called)
         _clear_sandboxed(monkeypatch)
 
         maybe_reexec(
@@ -837,24 +887,27 @@ class TestMockAgentfsBinary:
 # ===========================================================================
 
 
-class TestProbeAgentfs:
-    def test_parses_standard_version(self, tmp_path):
-        script = _mock_agentfs_script(tmp_path, version_output="agentfs v0.6.2")
-        result = probe_agentfs(script)
-        assert result["version"] == "0.6.2"
-        assert result["supports_strict_read"] is False
+class TestParseVersion:
+    @pytest.mark.parametrize(
+        "output,expected",
+        [
+            ("agentfs v0.6.2", "0.6.2"),
+            ("agentfs 0.6.2", "0.6.2"),
+            ("agentfs 0.6.2-3-gabcdef-dirty", "0.6.2"),
+            ("agentfs v0.6.2\n", "0.6.2"),
+            ("something weird", "unknown"),
+            ("", "unknown"),
+        ],
+    )
+    def test_parse(self, output, expected):
+        assert _parse_version(output) == expected
 
-    def test_parses_version_without_v_prefix(self, tmp_path):
-        script = _mock_agentfs_script(tmp_path, version_output="agentfs 0.6.2")
-        result = probe_agentfs(script)
-        assert result["version"] == "0.6.2"
 
-    def test_parses_dirty_version(self, tmp_path):
-        script = _mock_agentfs_script(
-            tmp_path, version_output="agentfs 0.6.2-3-gabcdef-dirty"
-        )
+class TestProbeAgentfs:
+    def test_probe_subprocess_integration(self, tmp_path):
+        script = _mock_agentfs_script(tmp_path, version_output="agentfs v0.6.2")
         result = probe_agentfs(script)
-        assert result["version"] == "0.6.2"
+        assert result == {"version": "0.6.2", "supports_strict_read": False}
 
     def test_returns_unknown_on_unparsable_output(self, tmp_path):
         script = _mock_agentfs_script(tmp_path, version_output="something weird")
@@ -894,11 +947,12 @@ class TestGetAgentfsVersion:
 
 
 class TestStrictReadValidation:
-    def test_strict_read_unsupported_raises(self, tmp_path, monkeypatch):
+    def test_strict_read_unsupported_raises(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         """--sandbox-strict-read with no agentfs support -> ConfigError."""
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
 
         with pytest.raises(ConfigError, match="strict read support"):
             maybe_reexec(
@@ -909,13 +963,14 @@ class TestStrictReadValidation:
                 sandbox_strict_read=True,
             )
 
-    def test_strict_read_false_does_not_raise(self, tmp_path, monkeypatch):
+    def test_strict_read_false_does_not_raise(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         """sandbox_strict_read=False should not trigger the check."""
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
-        monkeypatch.setattr(os, "execvpe", lambda f, a, e: None)
+        monkeypatch.setattr(os, "execve", lambda f, a, e: None)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         # Should not raise
@@ -927,10 +982,12 @@ class TestStrictReadValidation:
             sandbox_strict_read=False,
         )
 
-    def test_strict_read_error_includes_version(self, tmp_path, monkeypatch):
+    def test_strict_read_error_includes_version(
+        self, tmp_path, mock_agentfs_dir, fake_probe, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path, version_output="agentfs v0.7.0")
-        monkeypatch.setenv("PATH", str(tmp_path))
+        fake_probe("0.7.0")
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
 
         with pytest.raises(ConfigError, match="0.7.0"):
             maybe_reexec(
@@ -960,18 +1017,20 @@ class TestStrictReadValidation:
 
 
 class TestVersionPropagation:
-    def test_version_env_set_during_reexec(self, tmp_path, monkeypatch):
+    def test_version_env_set_during_reexec(
+        self, tmp_path, mock_agentfs_dir, fake_probe, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path, version_output="agentfs v0.8.1")
-        monkeypatch.setenv("PATH", str(tmp_path))
+        fake_probe("0.8.1")
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
-        captured = {}
+        captured = types.SimpleNamespace(env=None)
 
-        def fake_execvpe(file, args, env):
-            captured["env"] = env
+        def fake_execve(file, args, env):
+            captured.env = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -981,20 +1040,22 @@ class TestVersionPropagation:
             add_dirs=[],
         )
 
-        assert captured["env"][_VERSION_ENV] == "0.8.1"
+        assert captured.env[_VERSION_ENV] == "0.8.1"
 
-    def test_unknown_version_propagated(self, tmp_path, monkeypatch):
+    def test_unknown_version_propagated(
+        self, tmp_path, mock_agentfs_dir, fake_probe, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path, version_output="garbage")
-        monkeypatch.setenv("PATH", str(tmp_path))
+        fake_probe("unknown")
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
-        captured = {}
+        captured = types.SimpleNamespace(env=None)
 
-        def fake_execvpe(file, args, env):
-            captured["env"] = env
+        def fake_execve(file, args, env):
+            captured.env = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1004,7 +1065,7 @@ class TestVersionPropagation:
             add_dirs=[],
         )
 
-        assert captured["env"][_VERSION_ENV] == "unknown"
+        assert captured.env[_VERSION_ENV] == "unknown"
 
 
 # ===========================================================================
@@ -1013,73 +1074,45 @@ class TestVersionPropagation:
 
 
 class TestStrictReadReport:
-    def test_agentfs_report_includes_strict_read(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-            sandbox_strict_read=True,
-            agentfs_version="0.6.2",
-        )
-        assert r["sandbox"]["strict_read"] is True
-        assert r["sandbox"]["agentfs_version"] == "0.6.2"
-
-    def test_builtin_report_omits_strict_read(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="builtin",
-        )
-        assert "strict_read" not in r["sandbox"]
-        assert "agentfs_version" not in r["sandbox"]
-
-    def test_agentfs_version_omitted_when_none(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-        )
-        assert r["sandbox"]["strict_read"] is False
-        assert "agentfs_version" not in r["sandbox"]
-
-    def test_finalize_passes_strict_read_through(self):
-        rc = ReportCollector()
-        r = rc.finalize(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
-            sandbox_strict_read=True,
-            agentfs_version="0.7.0",
-        )
-        assert r["sandbox"]["strict_read"] is True
-        assert r["sandbox"]["agentfs_version"] == "0.7.0"
+    @pytest.mark.parametrize(
+        "method,extras,expected",
+        [
+            (
+                "build_report",
+                {
+                    "sandbox_mode": "agentfs",
+                    "sandbox_strict_read": True,
+                    "agentfs_version": "0.6.2",
+                },
+                {"mode": "agentfs", "strict_read": True, "agentfs_version": "0.6.2"},
+            ),
+            ("build_report", {"sandbox_mode": "builtin"}, {"mode": "builtin"}),
+            (
+                "build_report",
+                {"sandbox_mode": "agentfs"},
+                {"mode": "agentfs", "strict_read": False},
+            ),
+            (
+                "finalize",
+                {
+                    "sandbox_mode": "agentfs",
+                    "sandbox_strict_read": True,
+                    "agentfs_version": "0.7.0",
+                },
+                {"mode": "agentfs", "strict_read": True, "agentfs_version": "0.7.0"},
+            ),
+        ],
+        ids=[
+            "agentfs-strict-read",
+            "builtin-omits-strict-read",
+            "agentfs-no-version",
+            "finalize-passthrough",
+        ],
+    )
+    def test_sandbox_strict_read_fields(self, method, extras, expected):
+        build = getattr(ReportCollector(), method)
+        r = build(**_BASE_REPORT_KWARGS, **extras)
+        assert r["sandbox"] == expected
 
 
 # ===========================================================================
@@ -1088,16 +1121,14 @@ class TestStrictReadReport:
 
 
 class TestStrictReadCLI:
-    def test_flag_parsed_as_store_true(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(
+    def test_flag_parsed_as_store_true(self, cli_parser):
+        args = cli_parser.parse_args(
             ["--sandbox", "agentfs", "--sandbox-strict-read", "question"]
         )
         assert args.sandbox_strict_read is True
 
-    def test_default_is_unset(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(["question"])
+    def test_default_is_unset(self, cli_parser):
+        args = cli_parser.parse_args(["question"])
         assert args.sandbox_strict_read is _UNSET
 
     def test_config_default_is_false(self):
@@ -1172,19 +1203,20 @@ class TestDiffHint:
 
 
 class TestAutoSessionReexec:
-    def test_auto_session_used_when_no_explicit_session(self, tmp_path, monkeypatch):
+    def test_auto_session_used_when_no_explicit_session(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["args"] = args
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1200,19 +1232,20 @@ class TestAutoSessionReexec:
         assert captured["args"][session_idx + 1] == expected_session
         assert captured["env"][_SESSION_ENV] == expected_session
 
-    def test_explicit_session_overrides_auto(self, tmp_path, monkeypatch):
+    def test_explicit_session_overrides_auto(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["args"] = args
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1227,19 +1260,18 @@ class TestAutoSessionReexec:
         assert captured["args"][session_idx + 1] == "my-explicit"
         assert captured["env"][_SESSION_ENV] == "my-explicit"
 
-    def test_auto_session_disabled(self, tmp_path, monkeypatch):
+    def test_auto_session_disabled(self, tmp_path, mock_agentfs_dir, monkeypatch):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["args"] = args
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1260,18 +1292,19 @@ class TestAutoSessionReexec:
 
 
 class TestSessionEnvPropagation:
-    def test_session_env_set_with_session(self, tmp_path, monkeypatch):
+    def test_session_env_set_with_session(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1283,18 +1316,19 @@ class TestSessionEnvPropagation:
 
         assert captured["env"][_SESSION_ENV] == "test-sess"
 
-    def test_session_env_not_set_when_no_session(self, tmp_path, monkeypatch):
+    def test_session_env_not_set_when_no_session(
+        self, tmp_path, mock_agentfs_dir, monkeypatch
+    ):
         _clear_sandboxed(monkeypatch)
-        _mock_agentfs_script(tmp_path)
-        monkeypatch.setenv("PATH", str(tmp_path))
+        monkeypatch.setenv("PATH", str(mock_agentfs_dir))
         monkeypatch.setattr(sys, "argv", ["swival", "task"])
 
         captured = {}
 
-        def fake_execvpe(file, args, env):
+        def fake_execve(file, args, env):
             captured["env"] = env
 
-        monkeypatch.setattr(os, "execvpe", fake_execvpe)
+        monkeypatch.setattr(os, "execve", fake_execve)
         monkeypatch.setattr(os, "chdir", lambda p: None)
 
         maybe_reexec(
@@ -1314,9 +1348,8 @@ class TestSessionEnvPropagation:
 
 
 class TestAutoSessionConfig:
-    def test_flag_parsed(self):
-        parser = agent.build_parser()
-        args = parser.parse_args(["--no-sandbox-auto-session", "question"])
+    def test_flag_parsed(self, cli_parser):
+        args = cli_parser.parse_args(["--no-sandbox-auto-session", "question"])
         assert args.no_sandbox_auto_session is True
 
     def test_default_enabled(self):
@@ -1347,16 +1380,8 @@ class TestAutoSessionConfig:
 
 class TestDiffHintReport:
     def test_report_includes_diff_hint(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
+        r = ReportCollector().build_report(
+            **_BASE_REPORT_KWARGS,
             sandbox_mode="agentfs",
             sandbox_session="swival-abc123",
             diff_hint="agentfs diff swival-abc123",
@@ -1364,31 +1389,14 @@ class TestDiffHintReport:
         assert r["sandbox"]["diff_hint"] == "agentfs diff swival-abc123"
 
     def test_report_omits_diff_hint_when_none(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
-            sandbox_mode="agentfs",
+        r = ReportCollector().build_report(
+            **_BASE_REPORT_KWARGS, sandbox_mode="agentfs"
         )
         assert "diff_hint" not in r["sandbox"]
 
     def test_report_omits_diff_hint_for_builtin(self):
-        rc = ReportCollector()
-        r = rc.build_report(
-            task="test",
-            model="m",
-            provider="lmstudio",
-            settings={},
-            outcome="success",
-            answer="ok",
-            exit_code=0,
-            turns=1,
+        r = ReportCollector().build_report(
+            **_BASE_REPORT_KWARGS,
             sandbox_mode="builtin",
             diff_hint="agentfs diff something",
         )
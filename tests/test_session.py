@@ -32,6 +32,29 @@ def _exhausting_llm(*args, **kwargs):
     return _make_message(content=None, tool_calls=[tc]), "stop"
 
 
+@pytest.fixture(scope="class")
+def patched_agent():
+    """Stub the LLM and model discovery once per test class.
+
+    Tests needing a different ``call_llm`` override it with the function-scoped
+    ``monkeypatch``, which restores the class-level stub afterwards.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(agent, "call_llm", _simple_llm)
+        mp.setattr(agent, "discover_model", lambda *a: ("test-model", None))
+        yield
+
+
+@pytest.fixture(scope="module")
+def shared_session(tmp_path_factory):
+    """A Session reused by run() tests that do not depend on fresh state.
+
+    run() builds per-run state on every call; tests asserting isolation
+    between runs construct their own Session instead.
+    """
+    return Session(base_dir=str(tmp_path_factory.mktemp("shared")), history=False)
+
+
 def test_package_exposes_version():
     assert swival.__version__ == importlib.metadata.version("swival")
 
@@ -45,13 +68,10 @@ class TestResult:
         assert r.report is None
 
 
+@pytest.mark.usefixtures("patched_agent")
 class TestSessionRun:
-    def test_simple_run(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(agent, "call_llm", _simple_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
-        s = Session(base_dir=str(tmp_path), history=False)
-        result = s.run("What is 2+2?")
+    def test_simple_run(self, shared_session):
+        result = shared_session.run("What is 2+2?")
 
         assert isinstance(result, Result)
         assert result.answer == "the answer"
@@ -68,7 +88,6 @@ class TestSessionRun:
             return _make_message(content=f"answer {call_count}"), "stop"
 
         monkeypatch.setattr(agent, "call_llm", counting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
 
@@ -80,12 +99,8 @@ class TestSessionRun:
         # Messages should be independent
         assert r1.messages != r2.messages
 
-    def test_run_with_report(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(agent, "call_llm", _simple_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
-        s = Session(base_dir=str(tmp_path), history=False)
-        result = s.run("question", report=True)
+    def test_run_with_report(self, shared_session):
+        result = shared_session.run("question", report=True)
 
         assert result.report is not None
         assert result.report["result"]["outcome"] == "success"
@@ -93,7 +108,6 @@ class TestSessionRun:
 
     def test_run_exhausted(self, tmp_path, monkeypatch):
         monkeypatch.setattr(agent, "call_llm", _exhausting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
         monkeypatch.setattr(
             agent,
             "handle_tool_call",
@@ -123,8 +137,6 @@ class TestSessionRun:
             captured_roots.append(kwargs.get("skill_read_roots"))
             return original_run_agent_loop(messages, tools, **kwargs)
 
-        monkeypatch.setattr(agent, "call_llm", _simple_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
         monkeypatch.setattr(agent, "run_agent_loop", spy_loop)
 
         s = Session(base_dir=str(tmp_path), history=False)
@@ -135,6 +147,7 @@ class TestSessionRun:
         assert captured_roots[0] is not captured_roots[1]  # Different list objects
 
 
+@pytest.mark.usefixtures("patched_agent")
 class TestSessionAsk:
     def test_ask_shares_context(self, tmp_path, monkeypatch):
         call_count = 0
@@ -145,7 +158,6 @@ class TestSessionAsk:
             return _make_message(content=f"answer {call_count}"), "stop"
 
         monkeypatch.setattr(agent, "call_llm", counting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
 
@@ -162,7 +174,6 @@ class TestSessionAsk:
             raise AssertionError("info commands must not call the model")
 
         monkeypatch.setattr(agent, "call_llm", boom_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
         r = s.ask("/help", parse_commands=True)
@@ -171,9 +182,7 @@ class TestSessionAsk:
         assert "/help" in r.answer
         assert r.exhausted is False
 
-    def test_ask_info_command_emits_event(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
+    def test_ask_info_command_emits_event(self, tmp_path):
         events: list[tuple[str, dict]] = []
         s = Session(base_dir=str(tmp_path), history=False)
         s.event_callback = lambda kind, data: events.append((kind, data))
@@ -189,7 +198,6 @@ class TestSessionAsk:
             raise AssertionError("state/info commands must not call the model")
 
         monkeypatch.setattr(agent, "call_llm", boom_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False, max_turns=10)
         s.ask("/extend 50", parse_commands=True)
@@ -203,7 +211,6 @@ class TestSessionAsk:
             raise AgentError("backend exploded")
 
         monkeypatch.setattr(agent, "call_llm", failing_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
 
@@ -214,9 +221,7 @@ class TestSessionAsk:
         msgs = s._conv_state["messages"]
         assert all(m.get("role") != "user" for m in msgs)
 
-    def test_ask_quick_shell_gated_by_command_policy(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
+    def test_ask_quick_shell_gated_by_command_policy(self, tmp_path):
         s = Session(base_dir=str(tmp_path), history=False, commands="none")
         r = s.ask("!! echo hi", parse_commands=True)
 
@@ -228,7 +233,6 @@ class TestSessionAsk:
             return _make_message(content="treated as prompt"), "stop"
 
         monkeypatch.setattr(agent, "call_llm", counting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
         r = s.ask("/help")
@@ -245,7 +249,6 @@ class TestSessionAsk:
             return _make_message(content=f"answer {call_count}"), "stop"
 
         monkeypatch.setattr(agent, "call_llm", counting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
 
         s = Session(base_dir=str(tmp_path), history=False)
 
@@ -562,17 +565,14 @@ class TestSessionShellAllowed:
         assert s._shell_allowed is False
 
 
+@pytest.mark.usefixtures("patched_agent")
 class TestConvenienceRun:
-    def test_run_returns_string(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(agent, "call_llm", _simple_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
+    def test_run_returns_string(self, tmp_path):
         answer = swival.run("What is 2+2?", base_dir=str(tmp_path), history=False)
         assert answer == "the answer"
 
     def test_run_raises_on_exhaustion(self, tmp_path, monkeypatch):
         monkeypatch.setattr(agent, "call_llm", _exhausting_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
         monkeypatch.setattr(
             agent,
             "handle_tool_call",
@@ -625,12 +625,10 @@ class TestConfigError:
             s.run("hello")
 
 
+@pytest.mark.usefixtures("patched_agent")
 class TestVerboseOff:
-    def test_silent_by_default(self, tmp_path, monkeypatch, capsys):
+    def test_silent_by_default(self, tmp_path, capsys):
         """Library mode should produce no stderr output by default."""
-        monkeypatch.setattr(agent, "call_llm", _simple_llm)
-        monkeypatch.setattr(agent, "discover_model", lambda *a: ("test-model", None))
-
         s = Session(base_dir=str(tmp_path), history=False)
         s.run("question")
 
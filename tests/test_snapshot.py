@@ -1,7 +1,13 @@
 """Tests for the snapshot tool: proactive context collapse."""
 
+import copy
 import json
+from itertools import chain
+from operator import itemgetter
 
+import pytest
+
+from swival.agent import estimate_tokens, score_turn
 from swival.snapshot import (
     SNAPSHOT_HISTORY_SENTINEL,
     SnapshotState,
@@ -34,30 +40,83 @@ def _assistant_tc(name, tc_id, args_json="{}"):
     }
 
 
-def _build_exploration_messages():
-    """Build a realistic exploration sequence: user msg + several read_file tool calls."""
-    msgs = [
-        {"role": "system", "content": "You are a helpful assistant."},
-        _user("Debug the auth failure"),
-        _assistant_tc("read_file", "tc_1", '{"file_path": "auth.py"}'),
-        _tool("tc_1", "def authenticate(): ..."),
-        _assistant_tc("read_file", "tc_2", '{"file_path": "config.py"}'),
-        _tool("tc_2", "SECRET_KEY = 'abc'"),
-        _assistant_tc("grep", "tc_3", '{"pattern": "token"}'),
-        _tool("tc_3", "auth.py:42: token = parse(...)"),
-        _assistant_tc("read_file", "tc_4", '{"file_path": "parser.py"}'),
-        _tool("tc_4", "def parse(raw): return raw.strip()"),
+_get_id = itemgetter("id")
+
+
+def _collect_tc_ids(msgs):
+    """Return (defined, referenced) tool_call ID sets in a single pass."""
+    assert all(type(m) is dict for m in msgs)
+    defined = set()
+    referenced = set()
+    for m in msgs:
+        tc_calls = m.get("tool_calls")
+        if tc_calls:
+            defined.update(map(_get_id, tc_calls))
+        tc_id = m.get("tool_call_id")
+        if tc_id is not None:
+            referenced.add(tc_id)
+    return defined, referenced
+
+
+_EXPLORATION_TEMPLATE = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    _user("Debug the auth failure"),
+    _assistant_tc("read_file", "tc_1", '{"file_path": "auth.py"}'),
+    _tool("tc_1", "def authenticate(): ..."),
+    _assistant_tc("read_file", "tc_2", '{"file_path": "config.py"}'),
+    _tool("tc_2", "SECRET_KEY = 'abc'"),
+    _assistant_tc("grep", "tc_3", '{"pattern": "token"}'),
+    _tool("tc_3", "auth.py:42: token = parse(...)"),
+    _assistant_tc("read_file", "tc_4", '{"file_path": "parser.py"}'),
+    _tool("tc_4", "def parse(raw): return raw.strip()"),
+]
+
+
+def _read_pair(i):
+    return (
+        _assistant_tc("read_file", f"tc_{i}", f'{{"file_path": "f{i}.py"}}'),
+        _tool(f"tc_{i}", f"contents of f{i}.py"),
+    )
+
+
+def _build_exploration_messages(n=None):
+    """Build a realistic exploration sequence: user msg + several read_file tool calls.
+
+    Returns a deep copy of the module template, since restore mutates the list.
+    With *n*, synthesizes *n* read_file call/result pairs instead, for tests
+    that need a long history.
+    """
+    if n is None:
+        return copy.deepcopy(_EXPLORATION_TEMPLATE)
+    return [
+        *copy.deepcopy(_EXPLORATION_TEMPLATE[:2]),
+        *chain.from_iterable(_read_pair(i) for i in range(n)),
     ]
-    return msgs
+
+
+@pytest.fixture
+def state():
+    return SnapshotState()
+
+
+_QA_MSGS = (_user("q"), _assistant("a1"), _assistant("a2"))
+
+
+@pytest.fixture
+def msgs():
+    """A short user/assistant exchange; restore collapses the list in place."""
+    return list(_QA_MSGS)
+
+
+@pytest.fixture
+def sys_msg():
+    return {"role": "system", "content": "Base prompt."}
 
 
 class TestSave:
-    def test_save_basic(self):
-        state = SnapshotState()
-        result = json.loads(
-            state.process(
-                {"action": "save", "label": "checking auth"}, tool_call_id="tc_save"
-            )
+    def test_save_basic(self, state):
+        result = state._process(
+            {"action": "save", "label": "checking auth"}, tool_call_id="tc_save"
         )
         assert result["action"] == "save"
         assert result["status"] == "checkpoint_set"
@@ -65,28 +124,24 @@ class TestSave:
         assert state.explicit_label == "checking auth"
         assert state.explicit_begin_tool_call_id == "tc_save"
 
-    def test_save_resets_dirty(self):
-        state = SnapshotState()
+    def test_process_returns_json(self, state):
+        result = state.process(
+            {"action": "save", "label": "checking auth"}, tool_call_id="tc_save"
+        )
+        assert json.loads(result) == {
+            "action": "save",
+            "label": "checking auth",
+            "status": "checkpoint_set",
+        }
+
+    def test_save_resets_dirty(self, state):
         state.mark_dirty("edit_file")
         assert state.dirty is True
         state.process({"action": "save", "label": "test"}, tool_call_id="tc_s")
         assert state.dirty is False
         assert len(state.dirty_tools) == 0
 
-    def test_save_requires_label(self):
-        state = SnapshotState()
-        result = state.process({"action": "save"})
-        assert result.startswith("error:")
-        assert "label" in result
-
-    def test_save_label_too_long(self):
-        state = SnapshotState()
-        result = state.process({"action": "save", "label": "x" * 101})
-        assert result.startswith("error:")
-        assert "100" in result
-
-    def test_save_duplicate_blocked(self):
-        state = SnapshotState()
+    def test_save_duplicate_blocked(self, state):
         state.process({"action": "save", "label": "first"}, tool_call_id="tc1")
         result = state.process(
             {"action": "save", "label": "second"}, tool_call_id="tc2"
@@ -94,25 +149,21 @@ class TestSave:
         assert result.startswith("error:")
         assert "already active" in result
 
-    def test_save_increments_stats(self):
-        state = SnapshotState()
+    def test_save_increments_stats(self, state):
         state.process({"action": "save", "label": "test"}, tool_call_id="tc1")
         assert state.stats["saves"] == 1
 
 
 class TestRestoreImplicit:
-    def test_restore_implicit_from_user_message(self):
+    def test_restore_implicit_from_user_message(self, state):
         """Restore without save collapses from the last user message."""
-        state = SnapshotState()
         msgs = _build_exploration_messages()
         original_len = len(msgs)
 
-        result = json.loads(
-            state.process(
-                {"action": "restore", "summary": "Auth uses JWT. Config in config.py."},
-                messages=msgs,
-                tool_call_id="tc_restore",
-            )
+        result = state._process(
+            {"action": "restore", "summary": "Auth uses JWT. Config in config.py."},
+            messages=msgs,
+            tool_call_id="tc_restore",
         )
 
         assert result["action"] == "restore"
@@ -120,9 +171,8 @@ class TestRestoreImplicit:
         assert result["turns_collapsed"] > 0
         assert len(msgs) < original_len
 
-    def test_restore_recap_format(self):
+    def test_restore_recap_format(self, state):
         """The collapsed recap message has the correct format."""
-        state = SnapshotState()
         msgs = _build_exploration_messages()
         summary_text = "Root cause: missing null check in parser.py:42"
 
@@ -132,12 +182,16 @@ class TestRestoreImplicit:
             tool_call_id="tc_r",
         )
 
-        # Find the recap message
-        recap = None
-        for m in msgs:
-            if isinstance(m, dict) and m.get("content", "").startswith("[snapshot:"):
-                recap = m
-                break
+        # Find the recap message (tool-call messages carry content=None)
+        recap = next(
+            (
+                m
+                for m in msgs
+                if isinstance(m, dict)
+                and (m.get("content") or "").startswith("[snapshot:")
+            ),
+            None,
+        )
 
         assert recap is not None
         assert recap["role"] == "assistant"
@@ -145,9 +199,8 @@ class TestRestoreImplicit:
         assert "(collapsed" in recap["content"]
         assert "tool_calls" not in recap
 
-    def test_restore_no_orphaned_tool_call_ids(self):
+    def test_restore_no_orphaned_tool_call_ids(self, state):
         """After restore, no message has a tool_call_id without a matching tool_calls entry."""
-        state = SnapshotState()
         msgs = _build_exploration_messages()
 
         state.process(
@@ -156,59 +209,74 @@ class TestRestoreImplicit:
             tool_call_id="tc_r",
         )
 
-        tool_call_ids_defined = set()
-        for m in msgs:
-            if isinstance(m, dict) and "tool_calls" in m:
-                for tc in m["tool_calls"]:
-                    if isinstance(tc, dict):
-                        tool_call_ids_defined.add(tc["id"])
-                    else:
-                        tool_call_ids_defined.add(tc.id)
-
-        for m in msgs:
-            if isinstance(m, dict) and "tool_call_id" in m:
-                assert m["tool_call_id"] in tool_call_ids_defined
-
-    def test_restore_requires_summary(self):
-        state = SnapshotState()
-        result = state.process({"action": "restore"}, messages=[_user("test")])
-        assert result.startswith("error:")
-        assert "summary" in result
+        defined, referenced = _collect_tc_ids(msgs)
+        assert referenced <= defined
 
-    def test_restore_summary_too_long(self):
-        state = SnapshotState()
-        result = state.process(
-            {"action": "restore", "summary": "x" * 4001},
-            messages=[_user("test")],
+    def test_restore_long_history(self, state):
+        msgs = _build_exploration_messages(n=500)
+        result = state._process(
+            {"action": "restore", "summary": "Read 500 files"},
+            messages=msgs,
+            tool_call_id="tc_r",
         )
-        assert result.startswith("error:")
-        assert "4000" in result
+        # The last assistant tool call is the current turn and stays put
+        assert result["turns_collapsed"] == 998
+        assert len(msgs) == 5
+        defined, referenced = _collect_tc_ids(msgs)
+        assert referenced <= defined
 
-    def test_restore_empty_scope(self):
+    def test_restore_empty_scope(self, state):
         """Restore with nothing between checkpoint and current position."""
-        state = SnapshotState()
         msgs = [_user("test")]
-        result = json.loads(
-            state.process(
-                {"action": "restore", "summary": "nothing here"},
-                messages=msgs,
-                tool_call_id="tc_r",
-            )
+        result = state._process(
+            {"action": "restore", "summary": "nothing here"},
+            messages=msgs,
+            tool_call_id="tc_r",
         )
         assert result["status"] == "warning"
         assert "empty" in result["message"]
 
-    def test_restore_requires_messages(self):
-        state = SnapshotState()
-        result = state.process({"action": "restore", "summary": "test"})
+
+class TestValidationErrors:
+    @pytest.mark.parametrize(
+        "payload, messages, err_sub",
+        [
+            pytest.param({"action": "save"}, None, "label", id="save-no-label"),
+            pytest.param(
+                {"action": "save", "label": "x" * 101},
+                None,
+                "100",
+                id="save-label-too-long",
+            ),
+            pytest.param(
+                {"action": "restore"},
+                [_user("test")],
+                "summary",
+                id="restore-no-summary",
+            ),
+            pytest.param(
+                {"action": "restore", "summary": "x" * 4001},
+                [_user("test")],
+                "4000",
+                id="restore-summary-too-long",
+            ),
+            pytest.param(
+                {"action": "restore", "summary": "test"},
+                None,
+                "message",
+                id="restore-no-messages",
+            ),
+        ],
+    )
+    def test_validation_errors(self, state, payload, messages, err_sub):
+        result = state.process(payload, messages=messages)
         assert result.startswith("error:")
-        assert "message" in result.lower()
+        assert err_sub in result.lower()
 
 
 class TestRestoreExplicit:
-    def test_save_then_restore(self):
+    def test_save_then_restore(self, state):
         """save + restore collapses only from the save point."""
-        state = SnapshotState()
         msgs = [
             {"role": "system", "content": "sys"},
             _user("first question"),
@@ -216,26 +284,26 @@ class TestRestoreExplicit:
             _user("now debug auth"),
         ]
         # save checkpoint after user says "now debug auth"
-        msgs.append(
-            _assistant_tc("snapshot", "tc_save", '{"action":"save","label":"auth"}')
-        )
-        msgs.append(_tool("tc_save", '{"action":"save","status":"checkpoint_set"}'))
+        msgs += [
+            _assistant_tc("snapshot", "tc_save", '{"action":"save","label":"auth"}'),
+            _tool("tc_save", '{"action":"save","status":"checkpoint_set"}'),
+        ]
         state.process({"action": "save", "label": "auth"}, tool_call_id="tc_save")
 
         # Add exploration after the save
-        msgs.append(_assistant_tc("read_file", "tc_r1", '{"file_path":"auth.py"}'))
-        msgs.append(_tool("tc_r1", "content of auth.py"))
-        msgs.append(_assistant_tc("read_file", "tc_r2", '{"file_path":"jwt.py"}'))
-        msgs.append(_tool("tc_r2", "content of jwt.py"))
+        msgs += [
+            _assistant_tc("read_file", "tc_r1", '{"file_path":"auth.py"}'),
+            _tool("tc_r1", "content of auth.py"),
+            _assistant_tc("read_file", "tc_r2", '{"file_path":"jwt.py"}'),
+            _tool("tc_r2", "content of jwt.py"),
+        ]
 
         pre_restore_len = len(msgs)
 
-        result = json.loads(
-            state.process(
-                {"action": "restore", "summary": "Auth uses JWT in jwt.py"},
-                messages=msgs,
-                tool_call_id="tc_restore",
-            )
+        result = state._process(
+            {"action": "restore", "summary": "Auth uses JWT in jwt.py"},
+            messages=msgs,
+            tool_call_id="tc_restore",
         )
 
         assert result["status"] == "collapsed"
@@ -245,24 +313,25 @@ class TestRestoreExplicit:
         assert len(msgs) < pre_restore_len
         assert state.explicit_active is False
 
-    def test_explicit_scope_narrower_than_implicit(self):
+    def test_explicit_scope_narrower_than_implicit(self, state):
         """Explicit checkpoint should only collapse from save, not from user message."""
-        state = SnapshotState()
         msgs = [
             _user("question"),
             _assistant_tc("read_file", "tc_pre", '{"file_path":"pre.py"}'),
             _tool("tc_pre", "pre-save content"),
         ]
         # save checkpoint
-        msgs.append(
-            _assistant_tc("snapshot", "tc_save", '{"action":"save","label":"narrow"}')
-        )
-        msgs.append(_tool("tc_save", '{"status":"ok"}'))
+        msgs += [
+            _assistant_tc("snapshot", "tc_save", '{"action":"save","label":"narrow"}'),
+            _tool("tc_save", '{"status":"ok"}'),
+        ]
         state.process({"action": "save", "label": "narrow"}, tool_call_id="tc_save")
 
         # Post-save exploration
-        msgs.append(_assistant_tc("read_file", "tc_post", '{"file_path":"post.py"}'))
-        msgs.append(_tool("tc_post", "post-save content"))
+        msgs += [
+            _assistant_tc("read_file", "tc_post", '{"file_path":"post.py"}'),
+            _tool("tc_post", "post-save content"),
+        ]
 
         state.process(
             {"action": "restore", "summary": "Post-save summary"},
@@ -271,12 +340,20 @@ class TestRestoreExplicit:
         )
 
         # Pre-save messages should still exist
-        contents = [m.get("content") or "" for m in msgs if isinstance(m, dict)]
-        assert any("pre-save content" in c for c in contents)
+        assert any("pre-save content" in (m.get("content") or "") for m in msgs)
+
+    def test_marker_resolved_after_long_history(self, state):
+        """The scope starts right after the save marker, however deep it sits."""
+        msgs = _build_exploration_messages(n=200)
+        msgs += [
+            _assistant_tc("snapshot", "tc_save", '{"action":"save"}'),
+            _tool("tc_save", "ok"),
+        ]
+        state.process({"action": "save", "label": "deep"}, tool_call_id="tc_save")
+        assert state._resolve_start(msgs) == len(msgs)
 
-    def test_explicit_marker_removed_by_compaction(self):
+    def test_explicit_marker_removed_by_compaction(self, state):
         """If the save marker was compacted away, return an error."""
-        state = SnapshotState()
         state.explicit_active = True
         state.explicit_label = "test"
         state.explicit_begin_tool_call_id = "tc_gone"
@@ -294,65 +371,60 @@ class TestRestoreExplicit:
 
 
 class TestCancel:
-    def test_cancel_clears_explicit(self):
-        state = SnapshotState()
+    def test_cancel_clears_explicit(self, state):
         state.process({"action": "save", "label": "test"}, tool_call_id="tc1")
-        result = json.loads(state.process({"action": "cancel"}))
+        result = state._process({"action": "cancel"})
         assert result["status"] == "cleared"
         assert state.explicit_active is False
 
-    def test_cancel_no_checkpoint(self):
-        state = SnapshotState()
-        result = json.loads(state.process({"action": "cancel"}))
+    def test_cancel_no_checkpoint(self, state):
+        result = state._process({"action": "cancel"})
         assert result["status"] == "no_checkpoint"
 
-    def test_cancel_increments_stats(self):
-        state = SnapshotState()
+    def test_cancel_increments_stats(self, state):
         state.process({"action": "save", "label": "test"}, tool_call_id="tc1")
         state.process({"action": "cancel"})
         assert state.stats["cancels"] == 1
 
 
 class TestStatus:
-    def test_status_basic(self):
-        state = SnapshotState()
-        result = json.loads(state.process({"action": "status"}))
+    def test_status_basic(self, state):
+        result = state._process({"action": "status"})
         assert result["action"] == "status"
         assert result["explicit_active"] is False
         assert result["dirty"] is False
         assert result["history_count"] == 0
 
-    def test_status_with_active_checkpoint(self):
-        state = SnapshotState()
+    def test_status_with_active_checkpoint(self, state):
         state.process({"action": "save", "label": "active"}, tool_call_id="tc1")
-        result = json.loads(state.process({"action": "status"}))
+        result = state._process({"action": "status"})
         assert result["explicit_active"] is True
         assert result["explicit_label"] == "active"
 
-    def test_status_with_dirty_state(self):
-        state = SnapshotState()
+    def test_status_with_dirty_state(self, state):
         state.mark_dirty("edit_file")
-        result = json.loads(state.process({"action": "status"}))
+        result = state._process({"action": "status"})
         assert result["dirty"] is True
         assert "edit_file" in result["dirty_tools"]
 
 
 class TestDirtyTracking:
-    def test_read_only_tools_dont_dirty(self):
-        state = SnapshotState()
-        for tool in READ_ONLY_TOOLS:
-            state.mark_dirty(tool)
-        assert state.dirty is False
-        assert len(state.dirty_tools) == 0
-
-    def test_mutating_tools_dirty(self):
-        state = SnapshotState()
-        state.mark_dirty("edit_file")
-        assert state.dirty is True
-        assert "edit_file" in state.dirty_tools
+    @pytest.mark.parametrize(
+        "tool, dirty",
+        [(tool, False) for tool in sorted(READ_ONLY_TOOLS)]
+        + [
+            ("edit_file", True),
+            ("write_file", True),
+            ("run_command", True),
+            ("mcp__custom__do_thing", True),  # unknown tools count as mutating
+        ],
+    )
+    def test_mark_dirty(self, state, tool, dirty):
+        state.mark_dirty(tool)
+        assert state.dirty is dirty
+        assert (tool in state.dirty_tools) is dirty
 
-    def test_dirty_blocks_restore(self):
-        state = SnapshotState()
+    def test_dirty_blocks_restore(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("write_file")
 
@@ -365,22 +437,18 @@ class TestDirtyTracking:
         assert "dirty" in result
         assert "write_file" in result
 
-    def test_force_overrides_dirty(self):
-        state = SnapshotState()
+    def test_force_overrides_dirty(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("write_file")
 
-        result = json.loads(
-            state.process(
-                {"action": "restore", "summary": "forced summary", "force": True},
-                messages=msgs,
-                tool_call_id="tc_r",
-            )
+        result = state._process(
+            {"action": "restore", "summary": "forced summary", "force": True},
+            messages=msgs,
+            tool_call_id="tc_r",
         )
         assert result["status"] == "collapsed"
 
-    def test_force_restore_increments_stats(self):
-        state = SnapshotState()
+    def test_force_restore_increments_stats(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("edit_file")
         state.process(
@@ -390,8 +458,7 @@ class TestDirtyTracking:
         )
         assert state.stats["force_restores"] == 1
 
-    def test_dirty_blocked_increments_stats(self):
-        state = SnapshotState()
+    def test_dirty_blocked_increments_stats(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("run_command")
         state.process(
@@ -401,14 +468,12 @@ class TestDirtyTracking:
         )
         assert state.stats["blocked"] == 1
 
-    def test_dirty_resets_on_save(self):
-        state = SnapshotState()
+    def test_dirty_resets_on_save(self, state):
         state.mark_dirty("edit_file")
         state.process({"action": "save", "label": "test"}, tool_call_id="tc1")
         assert state.dirty is False
 
-    def test_dirty_resets_after_restore(self):
-        state = SnapshotState()
+    def test_dirty_resets_after_restore(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("edit_file")
         state.process(
@@ -418,22 +483,14 @@ class TestDirtyTracking:
         )
         assert state.dirty is False
 
-    def test_reset_dirty(self):
-        state = SnapshotState()
+    def test_reset_dirty(self, state):
         state.mark_dirty("edit_file")
         state.mark_dirty("run_command")
         state.reset_dirty()
         assert state.dirty is False
         assert len(state.dirty_tools) == 0
 
-    def test_unknown_tools_treated_as_dirty(self):
-        state = SnapshotState()
-        state.mark_dirty("mcp__custom__do_thing")
-        assert state.dirty is True
-        assert "mcp__custom__do_thing" in state.dirty_tools
-
-    def test_multiple_dirty_tools_tracked(self):
-        state = SnapshotState()
+    def test_multiple_dirty_tools_tracked(self, state):
         state.mark_dirty("edit_file")
         state.mark_dirty("run_command")
         state.mark_dirty("edit_file")  # duplicate
@@ -441,8 +498,7 @@ class TestDirtyTracking:
 
 
 class TestImplicitCheckpointResolution:
-    def test_resolves_from_last_user_message(self):
-        state = SnapshotState()
+    def test_resolves_from_last_user_message(self, state):
         msgs = [
             _user("first question"),
             _assistant("answer 1"),
@@ -462,9 +518,8 @@ class TestImplicitCheckpointResolution:
         assert msgs[1]["content"] == "answer 1"
         assert msgs[2]["content"] == "second question"
 
-    def test_resolves_from_last_restore_boundary(self):
+    def test_resolves_from_last_restore_boundary(self, state):
         """After a restore, the next implicit checkpoint is at the restore point."""
-        state = SnapshotState()
         msgs = [
             _user("question"),
             _assistant_tc("read_file", "tc_1"),
@@ -481,10 +536,12 @@ class TestImplicitCheckpointResolution:
         )
 
         # Add more exploration after first restore
-        msgs.append(_assistant_tc("read_file", "tc_3", '{"file_path":"c.py"}'))
-        msgs.append(_tool("tc_3", "content 3"))
-        msgs.append(_assistant_tc("grep", "tc_4", '{"pattern":"x"}'))
-        msgs.append(_tool("tc_4", "grep results"))
+        msgs += [
+            _assistant_tc("read_file", "tc_3", '{"file_path":"c.py"}'),
+            _tool("tc_3", "content 3"),
+            _assistant_tc("grep", "tc_4", '{"pattern":"x"}'),
+            _tool("tc_4", "grep results"),
+        ]
 
         pre_len = len(msgs)
 
@@ -498,13 +555,12 @@ class TestImplicitCheckpointResolution:
         assert len(msgs) < pre_len
         # The first recap should still be there
         found_first_recap = any(
-            isinstance(m, dict) and "first pass done" in m.get("content", "")
+            isinstance(m, dict) and "first pass done" in (m.get("content") or "")
             for m in msgs
         )
         assert found_first_recap
 
-    def test_no_user_message_returns_error(self):
-        state = SnapshotState()
+    def test_no_user_message_returns_error(self, state):
         msgs = [{"role": "system", "content": "system"}]
         result = state.process(
             {"action": "restore", "summary": "test"},
@@ -516,8 +572,7 @@ class TestImplicitCheckpointResolution:
 
 
 class TestHistory:
-    def test_history_recorded_on_restore(self):
-        state = SnapshotState()
+    def test_history_recorded_on_restore(self, state):
         msgs = _build_exploration_messages()
         state.process(
             {"action": "restore", "summary": "Auth uses JWT"},
@@ -530,8 +585,7 @@ class TestHistory:
         assert entry["scope_type"] == "implicit"
         assert entry["turns_collapsed"] > 0
 
-    def test_history_records_explicit_scope_type(self):
-        state = SnapshotState()
+    def test_history_records_explicit_scope_type(self, state):
         msgs = _build_exploration_messages()
         # Insert save marker
         msgs.insert(2, _assistant_tc("snapshot", "tc_save", '{"action":"save"}'))
@@ -546,8 +600,7 @@ class TestHistory:
         assert state.history[0]["scope_type"] == "explicit"
         assert state.history[0]["label"] == "auth debug"
 
-    def test_history_cap_enforced(self):
-        state = SnapshotState()
+    def test_history_cap_enforced(self, state):
         for i in range(MAX_HISTORY + 5):
             msgs = [_user(f"question {i}"), _assistant(f"answer {i}")]
             state.process(
@@ -559,8 +612,7 @@ class TestHistory:
         # Oldest should be dropped
         assert state.history[0]["summary"] == f"summary {MAX_HISTORY + 5 - MAX_HISTORY}"
 
-    def test_history_records_dirty_info(self):
-        state = SnapshotState()
+    def test_history_records_dirty_info(self, state):
         msgs = _build_exploration_messages()
         state.mark_dirty("edit_file")
         state.process(
@@ -573,12 +625,10 @@ class TestHistory:
 
 
 class TestInjectIntoPrompt:
-    def test_no_history_returns_none(self):
-        state = SnapshotState()
+    def test_no_history_returns_none(self, state):
         assert state.inject_into_prompt() is None
 
-    def test_renders_history(self):
-        state = SnapshotState()
+    def test_renders_history(self, state):
         msgs = [_user("q"), _assistant("a")]
         state.process(
             {"action": "restore", "summary": "Found the bug in auth.py"},
@@ -588,11 +638,10 @@ class TestInjectIntoPrompt:
 
         result = state.inject_into_prompt()
         assert result is not None
-        assert SNAPSHOT_HISTORY_SENTINEL in result
+        assert result.startswith(SNAPSHOT_HISTORY_SENTINEL)
         assert "Found the bug in auth.py" in result
 
-    def test_budget_respected(self):
-        state = SnapshotState()
+    def test_budget_respected(self, state):
         for i in range(MAX_HISTORY):
             msgs = [_user(f"q{i}"), _assistant(f"a{i}")]
             state.process(
@@ -605,10 +654,37 @@ class TestInjectIntoPrompt:
         assert result is not None
         assert len(result) <= 7000  # budget is 6000 + header
 
+    def test_render_cached_until_restore(self, state):
+        state.process(
+            {"action": "restore", "summary": "first"},
+            messages=[_user("q1"), _assistant("a1")],
+            tool_call_id="tc_1",
+        )
+        first = state.inject_into_prompt()
+        assert state.inject_into_prompt() is first
+
+        state.process(
+            {"action": "restore", "summary": "second"},
+            messages=[_user("q2"), _assistant("a2")],
+            tool_call_id="tc_2",
+        )
+        second = state.inject_into_prompt()
+        assert second is not first
+        assert "second" in second
+
+    def test_render_cache_cleared_on_reset(self, state):
+        state.process(
+            {"action": "restore", "summary": "finding"},
+            messages=[_user("q"), _assistant("a")],
+            tool_call_id="tc_r",
+        )
+        assert state.inject_into_prompt() is not None
+        state.reset()
+        assert state.inject_into_prompt() is None
+
 
 class TestReset:
-    def test_full_reset(self):
-        state = SnapshotState()
+    def test_full_reset(self, state):
         state.process({"action": "save", "label": "test"}, tool_call_id="tc1")
         state.mark_dirty("edit_file")
         msgs = [_user("q"), _assistant("a")]
@@ -631,12 +707,10 @@ class TestReset:
 
 
 class TestSummaryLine:
-    def test_no_usage_returns_none(self):
-        state = SnapshotState()
+    def test_no_usage_returns_none(self, state):
         assert state.summary_line() is None
 
-    def test_after_restore(self):
-        state = SnapshotState()
+    def test_after_restore(self, state):
         msgs = _build_exploration_messages()
         state.process(
             {"action": "restore", "summary": "test"},
@@ -650,19 +724,15 @@ class TestSummaryLine:
 
 
 class TestInvalidAction:
-    def test_unknown_action(self):
-        state = SnapshotState()
+    def test_unknown_action(self, state):
         result = state.process({"action": "bogus"})
         assert result.startswith("error:")
         assert "bogus" in result
 
 
 class TestTokenSavings:
-    def test_tokens_decrease_after_restore(self):
+    def test_tokens_decrease_after_restore(self, state):
         """estimate_tokens should decrease after a restore in a representative flow."""
-        from swival.agent import estimate_tokens
-
-        state = SnapshotState()
         msgs = _build_exploration_messages()
         tokens_before = estimate_tokens(msgs)
 
@@ -676,13 +746,22 @@ class TestTokenSavings:
         assert tokens_after < tokens_before
 
 
+@pytest.fixture(scope="module")
+def dispatch_dir(tmp_path_factory):
+    """Base dir shared by dispatch tests that only route to the snapshot tool.
+
+    Snapshot routing never touches disk; the read_file smoke test keeps its
+    own tmp_path.
+    """
+    return str(tmp_path_factory.mktemp("snapshot-dispatch"))
+
+
 class TestDispatchIntegration:
-    def test_dispatch_routes_to_snapshot(self, tmp_path):
-        state = SnapshotState()
+    def test_dispatch_routes_to_snapshot(self, dispatch_dir, state):
         result = dispatch(
             "snapshot",
             {"action": "status"},
-            str(tmp_path),
+            dispatch_dir,
             snapshot_state=state,
             messages=[],
             tool_call_id="tc1",
@@ -690,22 +769,21 @@ class TestDispatchIntegration:
         parsed = json.loads(result)
         assert parsed["action"] == "status"
 
-    def test_dispatch_snapshot_not_available(self, tmp_path):
+    def test_dispatch_snapshot_not_available(self, dispatch_dir):
         result = dispatch(
             "snapshot",
             {"action": "status"},
-            str(tmp_path),
+            dispatch_dir,
         )
         assert result.startswith("error:")
         assert "not available" in result
 
-    def test_dispatch_restore_with_messages(self, tmp_path):
-        state = SnapshotState()
+    def test_dispatch_restore_with_messages(self, dispatch_dir, state):
         msgs = [_user("test"), _assistant("reading"), _tool("tc1", "content")]
         result = dispatch(
             "snapshot",
             {"action": "restore", "summary": "done"},
-            str(tmp_path),
+            dispatch_dir,
             snapshot_state=state,
             messages=msgs,
             tool_call_id="tc_r",
@@ -730,6 +808,9 @@ class TestReadOnlyAllowlist:
         }
         assert expected == READ_ONLY_TOOLS
 
+    def test_allowlist_is_frozen(self):
+        assert isinstance(READ_ONLY_TOOLS, frozenset)
+
     def test_write_tools_not_in_allowlist(self):
         for tool in (
             "write_file",
@@ -757,10 +838,9 @@ class TestBehaviorUnchangedWithoutSnapshot:
 class TestOrphanedToolCallIds:
     """Simulate the agent loop flow to verify no orphaned tool_call_ids."""
 
-    def test_restore_preserves_current_assistant_message(self):
+    def test_restore_preserves_current_assistant_message(self, state):
         """When the assistant message issuing restore is in messages,
         it must not be collapsed — otherwise the tool result is orphaned."""
-        state = SnapshotState()
         msgs = [
             {"role": "system", "content": "system"},
             _user("debug auth"),
@@ -775,12 +855,10 @@ class TestOrphanedToolCallIds:
         )
         msgs.append(restore_assistant)
 
-        result = json.loads(
-            state.process(
-                {"action": "restore", "summary": "Auth uses JWT in a.py"},
-                messages=msgs,
-                tool_call_id="tc_restore",
-            )
+        result = state._process(
+            {"action": "restore", "summary": "Auth uses JWT in a.py"},
+            messages=msgs,
+            tool_call_id="tc_restore",
         )
         assert result["status"] == "collapsed"
 
@@ -792,21 +870,13 @@ class TestOrphanedToolCallIds:
         msgs.append(tool_result)
 
         # Verify no orphaned tool_call_ids
-        tc_ids_defined = set()
-        for m in msgs:
-            if isinstance(m, dict):
-                for tc in m.get("tool_calls", []):
-                    tc_ids_defined.add(tc["id"] if isinstance(tc, dict) else tc.id)
-
-        for m in msgs:
-            if isinstance(m, dict) and "tool_call_id" in m:
-                assert m["tool_call_id"] in tc_ids_defined, (
-                    f"orphaned tool_call_id: {m['tool_call_id']}"
-                )
-
-    def test_mixed_tool_calls_no_orphans(self):
+        defined, referenced = _collect_tc_ids(msgs)
+        assert referenced <= defined, (
+            f"orphaned tool_call_ids: {sorted(referenced - defined)}"
+        )
+
+    def test_mixed_tool_calls_no_orphans(self, state):
         """When restore is in a batch with other tool calls, all IDs stay valid."""
-        state = SnapshotState()
         msgs = [
             _user("question"),
             _assistant_tc("read_file", "tc_1"),
@@ -851,80 +921,52 @@ class TestOrphanedToolCallIds:
         assert batch_assistant in msgs
 
         # Check no orphans
-        tc_ids_defined = set()
-        for m in msgs:
-            if isinstance(m, dict):
-                for tc in m.get("tool_calls", []):
-                    tc_ids_defined.add(tc["id"] if isinstance(tc, dict) else tc.id)
-        for m in msgs:
-            if isinstance(m, dict) and "tool_call_id" in m:
-                assert m["tool_call_id"] in tc_ids_defined
+        defined, referenced = _collect_tc_ids(msgs)
+        assert referenced <= defined
+
+
+def _simulate_streak(turns, break_at=None):
+    """Mirror run_agent_loop's nudge tracking over *turns* read-only turns.
+
+    A mutation before turn *break_at* resets the streak.  Returns
+    ``(nudge_count, nudge_fired)``.
+    """
+    snapshot_read_streak = 0
+    snapshot_nudge_fired = False
+    nudge_count = 0
+    for turn in range(turns):
+        if turn == break_at:
+            snapshot_read_streak = 0
+            snapshot_nudge_fired = False
+        snapshot_read_streak += 1
+        if snapshot_read_streak >= 5 and not snapshot_nudge_fired:
+            snapshot_nudge_fired = True
+            nudge_count += 1
+    return nudge_count, snapshot_nudge_fired
 
 
 class TestNudgePerStreak:
     """Snapshot nudge should fire once per read streak, not once per run."""
 
-    def test_nudge_resets_after_write(self):
-        """After a mutation breaks the streak, a new streak can trigger a new nudge."""
-        # Simulate the nudge tracking logic from run_agent_loop
-        snapshot_read_streak = 0
-        snapshot_nudge_fired = False
-        nudge_count = 0
-
-        # First streak: 5 read-only turns
-        for _ in range(5):
-            all_readonly = True
-            if all_readonly:
-                snapshot_read_streak += 1
-                if snapshot_read_streak >= 5 and not snapshot_nudge_fired:
-                    snapshot_nudge_fired = True
-                    nudge_count += 1
-
-        assert nudge_count == 1
-        assert snapshot_nudge_fired is True
-
-        # Write breaks the streak
-        all_readonly = False
-        snapshot_read_streak = 0
-        snapshot_nudge_fired = False
-
-        # Second streak: 5 more read-only turns
-        for _ in range(5):
-            all_readonly = True
-            if all_readonly:
-                snapshot_read_streak += 1
-                if snapshot_read_streak >= 5 and not snapshot_nudge_fired:
-                    snapshot_nudge_fired = True
-                    nudge_count += 1
-
-        # Should have nudged twice total (once per streak)
-        assert nudge_count == 2
-
-    def test_no_double_nudge_within_streak(self):
-        """Within a single streak, nudge fires only once."""
-        snapshot_read_streak = 0
-        snapshot_nudge_fired = False
-        nudge_count = 0
-
-        for _ in range(10):
-            all_readonly = True
-            if all_readonly:
-                snapshot_read_streak += 1
-                if snapshot_read_streak >= 5 and not snapshot_nudge_fired:
-                    snapshot_nudge_fired = True
-                    nudge_count += 1
-
-        assert nudge_count == 1
+    @pytest.mark.parametrize(
+        "turns, break_at, expected_nudges",
+        [
+            pytest.param(5, None, 1, id="single-streak"),
+            pytest.param(10, None, 1, id="no-double-nudge-within-streak"),
+            pytest.param(10, 5, 2, id="resets-after-write"),
+        ],
+    )
+    def test_nudge_once_per_streak(self, turns, break_at, expected_nudges):
+        nudge_count, fired = _simulate_streak(turns, break_at)
+        assert nudge_count == expected_nudges
+        assert fired is True
 
 
 class TestDirtyStateOnContinue:
     """Dirty state should not be cleared on /continue (no new user boundary)."""
 
-    def test_dirty_preserved_when_last_msg_is_not_user(self):
+    def test_dirty_preserved_when_last_msg_is_not_user(self, state):
         """Simulates /continue: last message is assistant, dirty should persist."""
-        from swival.snapshot import SnapshotState
-
-        state = SnapshotState()
         state.mark_dirty("edit_file")
 
         # Simulate messages ending with an assistant message (as in /continue)
@@ -942,9 +984,8 @@ class TestDirtyStateOnContinue:
         assert state.dirty is True
         assert "edit_file" in state.dirty_tools
 
-    def test_dirty_reset_when_last_msg_is_user(self):
+    def test_dirty_reset_when_last_msg_is_user(self, state):
         """Normal entry: last message is user, dirty should reset."""
-        state = SnapshotState()
         state.mark_dirty("edit_file")
 
         msgs = [_user("new question")]
@@ -956,12 +997,21 @@ class TestDirtyStateOnContinue:
         assert state.dirty is False
 
 
+# Mirrors how run_agent_loop delimits the injected block in the system message
+_STRIP_MARKER = "\n\n" + SNAPSHOT_HISTORY_SENTINEL
+
+
+def _assert_single_history_block(content):
+    first = content.find(SNAPSHOT_HISTORY_SENTINEL)
+    assert first != -1
+    assert content.find(SNAPSHOT_HISTORY_SENTINEL, first + 1) == -1
+
+
 class TestHistoryInjection:
     """Test that snapshot history is injected into the system message."""
 
-    def test_history_injected_into_system_message(self):
+    def test_history_injected_into_system_message(self, state):
         """After a restore, inject_into_prompt output should appear in sys msg."""
-        state = SnapshotState()
         msgs = [
             {"role": "system", "content": "You are helpful."},
             _user("question"),
@@ -978,10 +1028,8 @@ class TestHistoryInjection:
         assert history_text is not None
         assert "Found bug in auth.py:42" in history_text
 
-    def test_injection_does_not_double_inject(self):
+    def test_injection_does_not_double_inject(self, state, sys_msg):
         """Repeated injection replaces previous injection, not appends."""
-        state = SnapshotState()
-        sys_msg = {"role": "system", "content": "Base prompt."}
 
         # First restore
         msgs = [sys_msg, _user("q1"), _assistant("a1")]
@@ -1005,8 +1053,7 @@ class TestHistoryInjection:
 
         # Remove old injection and re-inject
         base = sys_msg["content"]
-        strip_marker = "\n\n" + SNAPSHOT_HISTORY_SENTINEL
-        idx = base.find(strip_marker)
+        idx = base.find(_STRIP_MARKER)
         if idx != -1:
             sys_msg["content"] = base[:idx]
 
@@ -1014,16 +1061,14 @@ class TestHistoryInjection:
         sys_msg["content"] += "\n\n" + history
 
         # Should contain both findings but only one header
-        assert sys_msg["content"].count(SNAPSHOT_HISTORY_SENTINEL) == 1
+        _assert_single_history_block(sys_msg["content"])
         assert "first finding" in sys_msg["content"]
         assert "second finding" in sys_msg["content"]
 
-    def test_no_duplication_across_reentry(self):
+    def test_no_duplication_across_reentry(self, state, sys_msg):
         """Simulates /continue: run_agent_loop re-enters with history already
         in the system message. The injection logic must strip the old block
         before adding the new one, even on a fresh invocation."""
-        state = SnapshotState()
-        sys_msg = {"role": "system", "content": "Base prompt."}
 
         # First restore populates history
         msgs = [sys_msg, _user("q1"), _assistant("a1")]
@@ -1034,17 +1079,16 @@ class TestHistoryInjection:
         )
 
         # Simulate first run_agent_loop injection
-        strip_marker = "\n\n" + SNAPSHOT_HISTORY_SENTINEL
         history_text = state.inject_into_prompt()
         sys_msg["content"] += "\n\n" + history_text
 
-        assert sys_msg["content"].count(SNAPSHOT_HISTORY_SENTINEL) == 1
+        _assert_single_history_block(sys_msg["content"])
 
         # Simulate /continue re-entry: a fresh call to run_agent_loop
         # would have _snapshot_history_injected=False (local var reset).
         # The fix must still strip the old block from sys_msg.
         base = sys_msg["content"]
-        idx = base.find(strip_marker)
+        idx = base.find(_STRIP_MARKER)
         if idx != -1:
             base = base[:idx]
         history_text = state.inject_into_prompt()
@@ -1054,15 +1098,13 @@ class TestHistoryInjection:
             sys_msg["content"] = base
 
         # Must have exactly one history block, not two
-        assert sys_msg["content"].count(SNAPSHOT_HISTORY_SENTINEL) == 1
+        _assert_single_history_block(sys_msg["content"])
         assert sys_msg["content"].startswith("Base prompt.")
         assert "finding one" in sys_msg["content"]
 
 
 class TestCompactionScoring:
     def test_snapshot_recap_gets_high_score(self):
-        from swival.agent import score_turn
-
         recap = _assistant(
             "[snapshot: auth debug]\nAuth uses JWT.\n(collapsed 5 turns)"
         )
@@ -1071,9 +1113,8 @@ class TestCompactionScoring:
 
 
 class TestSaveAtIndex:
-    def test_save_at_index_basic(self):
-        state = SnapshotState()
-        result = json.loads(state.save_at_index("checkpoint-1", 5))
+    def test_save_at_index_basic(self, state):
+        result = state._save_at_index("checkpoint-1", 5)
         assert result["action"] == "save"
         assert result["status"] == "checkpoint_set"
         assert state.explicit_active is True
@@ -1081,46 +1122,46 @@ class TestSaveAtIndex:
         assert state.explicit_begin_index == 5
         assert state._save_generation == 0
 
-    def test_save_at_index_resets_dirty(self):
-        state = SnapshotState()
+    def test_save_at_index_returns_json(self, state):
+        assert json.loads(state.save_at_index("checkpoint-1", 5)) == {
+            "action": "save",
+            "label": "checkpoint-1",
+            "status": "checkpoint_set",
+        }
+
+    def test_save_at_index_resets_dirty(self, state):
         state.mark_dirty("edit_file")
         state.save_at_index("test", 3)
         assert state.dirty is False
 
-    def test_save_at_index_increments_stats(self):
-        state = SnapshotState()
+    def test_save_at_index_increments_stats(self, state):
         state.save_at_index("test", 0)
         assert state.stats["saves"] == 1
 
-    def test_save_at_index_empty_label_rejected(self):
-        state = SnapshotState()
+    def test_save_at_index_empty_label_rejected(self, state):
         result = state.save_at_index("", 0)
         assert result.startswith("error:")
         assert "label" in result
 
-    def test_save_at_index_duplicate_rejected(self):
-        state = SnapshotState()
+    def test_save_at_index_duplicate_rejected(self, state):
         state.save_at_index("first", 0)
         result = state.save_at_index("second", 5)
         assert result.startswith("error:")
         assert "already active" in result
 
-    def test_save_at_index_label_too_long(self):
-        state = SnapshotState()
+    def test_save_at_index_label_too_long(self, state):
         result = state.save_at_index("x" * 101, 0)
         assert result.startswith("error:")
 
 
 class TestResolveStartWithIndex:
-    def test_resolve_start_returns_saved_index(self):
-        state = SnapshotState()
+    def test_resolve_start_returns_saved_index(self, state):
         msgs = [_user("q1"), _assistant("a1"), _user("q2"), _assistant("a2")]
         state.save_at_index("test", 2)
         idx = state._resolve_start(msgs)
         assert idx == 2
 
-    def test_resolve_start_stale_generation(self):
-        state = SnapshotState()
+    def test_resolve_start_stale_generation(self, state):
         msgs = [_user("q1"), _assistant("a1"), _user("q2"), _assistant("a2")]
         state.save_at_index("test", 2)
         state.invalidate_index_checkpoint()
@@ -1130,9 +1171,7 @@ class TestResolveStartWithIndex:
 
 
 class TestRestoreWithAutosummary:
-    def test_basic_autosummary(self):
-        state = SnapshotState()
-        msgs = [_user("q"), _assistant("a1"), _assistant("a2")]
+    def test_basic_autosummary(self, state, msgs):
         state.save_at_index("test", 1)
 
         result = state.restore_with_autosummary(
@@ -1145,18 +1184,14 @@ class TestRestoreWithAutosummary:
         assert len(state.history) == 1
         assert state.history[0]["summary"] == "auto-generated summary"
 
-    def test_autosummary_fallback_on_none(self):
-        state = SnapshotState()
-        msgs = [_user("q"), _assistant("a1"), _assistant("a2")]
+    def test_autosummary_fallback_on_none(self, state, msgs):
         state.save_at_index("test", 1)
 
-        result = state.restore_with_autosummary(msgs, lambda text: None)
-        parsed = json.loads(result)
-        assert parsed["status"] == "collapsed"
+        result = state._restore_with_autosummary(msgs, lambda text: None)
+        assert result["status"] == "collapsed"
         assert state.history[0]["summary"] == "(context collapsed by user)"
 
-    def test_manual_end_boundary_includes_full_tail(self):
-        state = SnapshotState()
+    def test_manual_end_boundary_includes_full_tail(self, state):
         msgs = [
             _user("q"),
             _assistant_tc("read_file", "tc1"),
@@ -1165,12 +1200,10 @@ class TestRestoreWithAutosummary:
         ]
         state.save_at_index("test", 1)
 
-        result = state.restore_with_autosummary(msgs, lambda t: "summary")
-        parsed = json.loads(result)
-        assert parsed["turns_collapsed"] == 3
+        result = state._restore_with_autosummary(msgs, lambda t: "summary")
+        assert result["turns_collapsed"] == 3
 
-    def test_empty_scope_returns_message(self):
-        state = SnapshotState()
+    def test_empty_scope_returns_message(self, state):
         msgs = [_user("q")]
         state.save_at_index("test", 1)
         result = state.restore_with_autosummary(msgs, lambda t: "summary")
@@ -1178,24 +1211,20 @@ class TestRestoreWithAutosummary:
 
 
 class TestIndexClearedOnOperations:
-    def test_index_cleared_on_cancel(self):
-        state = SnapshotState()
+    def test_index_cleared_on_cancel(self, state):
         state.save_at_index("test", 5)
         state.cancel()
         assert state.explicit_begin_index is None
         assert state._save_generation is None
 
-    def test_index_cleared_on_reset(self):
-        state = SnapshotState()
+    def test_index_cleared_on_reset(self, state):
         state.save_at_index("test", 5)
         state.reset()
         assert state.explicit_begin_index is None
         assert state._save_generation is None
         assert state._generation == 0
 
-    def test_index_cleared_on_restore(self):
-        state = SnapshotState()
-        msgs = [_user("q"), _assistant("a1"), _assistant("a2")]
+    def test_index_cleared_on_restore(self, state, msgs):
         state.save_at_index("test", 1)
         state.restore_with_autosummary(msgs, lambda t: "summary")
         assert state.explicit_begin_index is None
@@ -1204,14 +1233,12 @@ class TestIndexClearedOnOperations:
 
 
 class TestInvalidateIndexCheckpoint:
-    def test_invalidate_increments_generation(self):
-        state = SnapshotState()
+    def test_invalidate_increments_generation(self, state):
         assert state._generation == 0
         state.invalidate_index_checkpoint()
         assert state._generation == 1
 
-    def test_multiple_invalidations(self):
-        state = SnapshotState()
+    def test_multiple_invalidations(self, state):
         state.invalidate_index_checkpoint()
         state.invalidate_index_checkpoint()
         assert state._generation == 2